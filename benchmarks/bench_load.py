@@ -0,0 +1,81 @@
+"""
+Benchmark: row-by-row vs batched loading into the star schema.
+
+Runs both strategies against the configured Postgres inside a transaction
+that is rolled back, so the database is left untouched.
+
+    python benchmarks/bench_load.py --rows 5000 --batch 100
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db.connection import get_connection, init_db
+from src.etl.extract_bolsa_familia import load_star_schema
+from benchmarks.synthetic import make_items
+
+def load_row_by_row(cur, items):
+    """The original process_and_load loop: three statements per item."""
+    for item in items:
+        mun = item.get("municipio", {})
+        uf = mun.get("uf", {})
+        prog = item.get("tipo", {})
+        cur.execute("""
+            INSERT INTO dim_municipio (codigo_ibge, nome_ibge, uf_sigla, nome_regiao, pais)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (codigo_ibge) DO UPDATE SET
+                nome_ibge = EXCLUDED.nome_ibge,
+                uf_sigla = EXCLUDED.uf_sigla,
+                nome_regiao = EXCLUDED.nome_regiao;
+        """, (mun.get("codigoIBGE"), mun.get("nomeIBGE"), uf.get("sigla"), mun.get("nomeRegiao"), mun.get("pais")))
+        cur.execute("""
+            INSERT INTO dim_programa (id, descricao, descricao_detalhada)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (id) DO UPDATE SET
+                descricao = EXCLUDED.descricao,
+                descricao_detalhada = EXCLUDED.descricao_detalhada;
+        """, (prog.get("id"), prog.get("descricao"), prog.get("descricaoDetalhada")))
+        cur.execute("""
+            INSERT INTO fact_pagamentos_municipio 
+            (data_referencia, codigo_ibge, programa_id, valor_total, quantidade_beneficiados)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (data_referencia, codigo_ibge, programa_id) DO UPDATE SET
+                valor_total = EXCLUDED.valor_total,
+                quantidade_beneficiados = EXCLUDED.quantidade_beneficiados;
+        """, (item.get("dataReferencia"), mun.get("codigoIBGE"), prog.get("id"), item.get("valor"), item.get("quantidadeBeneficiados")))
+
+def run(loader, items, batch):
+    """Loads `items` in pages of `batch` and returns rows/sec. Always rolls back."""
+    conn = get_connection()
+    if not conn:
+        raise SystemExit("❌ Connection failed")
+    try:
+        cur = conn.cursor()
+        started = time.perf_counter()
+        for i in range(0, len(items), batch):
+            loader(cur, items[i:i + batch])
+        elapsed = time.perf_counter() - started
+        return len(items) / elapsed
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Star schema load benchmark')
+    parser.add_argument('--rows', type=int, default=5000, help='Synthetic rows to load')
+    parser.add_argument('--batch', type=int, default=100, help='Rows per API page')
+    args = parser.parse_args()
+
+    init_db()
+    items = make_items(args.rows)
+
+    before = run(load_row_by_row, items, args.batch)
+    after = run(load_star_schema, items, args.batch)
+
+    print(f"Rows: {args.rows} | Page size: {args.batch}")
+    print(f"  row-by-row : {before:10.0f} rows/s")
+    print(f"  batched    : {after:10.0f} rows/s  ({after / before:.1f}x)")
@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Portal da Transparência API.
+
+Serves paginated responses shaped like sample_response.json for any number of
+municipalities, with optional latency and injected 429s.
+
+    python benchmarks/mock_portal.py --port 8089 --municipalities 5570 --latency-ms 80 --rate-429 0.02
+    PORTAL_API_URL=http://localhost:8089 python src/etl/extract_bolsa_familia.py ...
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import municipality_codes, make_item
+
+PAGE_SIZE = 15
+
+class MockPortal:
+    def __init__(self, port=0, municipalities=100, rows_per_municipality=1,
+                 page_size=PAGE_SIZE, latency_ms=0.0, rate_429=0.0, seed=42):
+        self.codigos = municipality_codes(municipalities)
+        self.known = set(self.codigos)
+        self.rows_per_municipality = rows_per_municipality
+        self.page_size = page_size
+        self.latency = latency_ms / 1000.0
+        self.rate_429 = rate_429
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _page(self, params):
+        mes_ano = params.get("mesAno", "202401")
+        page = max(int(params.get("pagina", 1)), 1)
+        codigo = params.get("codigoIbge")
+        if codigo:
+            if codigo not in self.known:
+                return []
+            items = [make_item(codigo, mes_ano, seq=i) for i in range(self.rows_per_municipality)]
+        else:
+            # National listing: every municipality, page_size at a time
+            start = (page - 1) * self.page_size
+            return [make_item(c, mes_ano) for c in self.codigos[start:start + self.page_size]]
+        start = (page - 1) * self.page_size
+        return items[start:start + self.page_size]
+
+    def _handler(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                with portal._lock:
+                    portal.requests += 1
+                    throttle = portal._random.random() < portal.rate_429
+                    jitter = portal._random.uniform(0.5, 1.5)
+                if portal.latency:
+                    time.sleep(portal.latency * jitter)
+                if throttle:
+                    with portal._lock:
+                        portal.throttled += 1
+                    self._send(429, {"mensagem": "Too Many Requests"}, {"Retry-After": "1"})
+                    return
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                self._send(200, portal._page(params))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock Portal da Transparência API')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--municipalities', type=int, default=5570)
+    parser.add_argument('--rows-per-municipality', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Fraction of requests answered with 429')
+    args = parser.parse_args()
+
+    portal = MockPortal(args.port, args.municipalities, args.rows_per_municipality,
+                        args.page_size, args.latency_ms, args.rate_429)
+    print(f"🧪 Mock Portal listening on {portal.url} ({args.municipalities} municipalities)")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        portal.stop()
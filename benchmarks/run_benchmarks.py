@@ -0,0 +1,231 @@
+"""
+Benchmark / load-test suite for the ETL and MCP paths.
+
+Everything runs against a local mock of the Portal API (benchmarks/mock_portal.py)
+and a disposable Postgres database created on the configured server
+(POSTGRES_*/DB_HOST) and dropped at the end. Each scenario runs in its own
+process so peak RSS is per scenario.
+
+    python benchmarks/run_benchmarks.py                       # every scenario
+    python benchmarks/run_benchmarks.py etl mcp --municipalities 2000 --latency-ms 50 --rate-429 0.02
+    python benchmarks/run_benchmarks.py --json bench_output.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SCENARIOS = ["load", "etl", "mcp", "portal"]
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None, "calls": 0}
+    def pick(q):
+        return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))] * 1000
+    return {"p50_ms": round(pick(0.50), 3), "p99_ms": round(pick(0.99), 3), "calls": len(samples)}
+
+def months_for(count):
+    return [f"2024{m:02d}" for m in range(1, count + 1)]
+
+# --- Scenarios (run inside the child process) ---
+
+def scenario_load(args):
+    from benchmarks.bench_load import run, load_row_by_row
+    from benchmarks.synthetic import make_items
+    from src.etl.extract_bolsa_familia import load_star_schema
+    items = make_items(args.rows)
+    before = run(load_row_by_row, items, args.page_size)
+    after = run(load_star_schema, items, args.page_size)
+    return {"row_by_row_rows_per_s": round(before), "batched_rows_per_s": round(after),
+            "speedup": round(after / before, 2)}
+
+def scenario_etl(args):
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    import src.etl.extract_bolsa_familia as etl
+    from benchmarks.synthetic import municipality_codes
+    from src.db.connection import connection
+
+    etl.rate_limiter.set_rate(args.api_rate / 60.0)
+    codigos = [etl.NATIONAL] if args.national else municipality_codes(args.municipalities)
+    started = time.perf_counter()
+    meter = etl.run_concurrent(months_for(args.months), codigos, workers=args.workers, force=True)
+    elapsed = time.perf_counter() - started
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM fact_pagamentos_municipio;")
+        facts = cur.fetchone()[0]
+    return {"jobs": meter.total_jobs, "pages": meter.requests, "records": meter.records,
+            "fact_rows": facts, "elapsed_s": round(elapsed, 2),
+            "pages_per_s": round(meter.requests / elapsed, 1),
+            "rows_per_s": round(meter.records / elapsed, 1),
+            "stages": meter.stages}
+
+def scenario_mcp(args):
+    import postgres_mcp as pg
+    tools = {
+        "list_tables": lambda: pg.list_tables(),
+        "describe_table": lambda: pg.describe_table("fact_pagamentos_municipio"),
+        "list_aggregate_tables": lambda: pg.list_aggregate_tables(),
+        "run_read_only_query (cached)": lambda: pg.run_read_only_query(
+            "SELECT uf_sigla, SUM(valor_total) FROM agg_mensal_uf_programa GROUP BY 1"),
+        "run_read_only_query (uncached)": lambda: (pg._results.clear(), pg.run_read_only_query(
+            "SELECT m.uf_sigla, SUM(f.valor_total) FROM fact_pagamentos_municipio f "
+            "JOIN dim_municipio m USING (codigo_ibge) GROUP BY 1")),
+        "run_read_only_query (paged scan)": lambda: pg.run_read_only_query(
+            "SELECT * FROM fact_pagamentos_municipio", max_rows=500),
+    }
+    results = {}
+    for name, call in tools.items():
+        call()  # warm-up (pool, catalog)
+        samples = []
+        for _ in range(args.calls):
+            t = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - t)
+        results[name] = percentiles(samples)
+    return results
+
+def scenario_portal(args):
+    os.environ.setdefault("API_KEY", "benchmark")
+    import portal_safe_server as portal
+    from benchmarks.synthetic import municipality_codes
+
+    portal.api_guard.limiter.set_rate(args.api_rate / 60.0)
+    codigos = municipality_codes(args.calls)
+
+    async def timed(codigo):
+        t = time.perf_counter()
+        await portal.safe_request("/novo-bolsa-familia-por-municipio",
+                                  {"mesAno": "202401", "codigoIbge": codigo, "pagina": 1})
+        return time.perf_counter() - t
+
+    async def main():
+        started = time.perf_counter()
+        cold = await asyncio.gather(*[timed(c) for c in codigos])
+        elapsed = time.perf_counter() - started
+        warm = await asyncio.gather(*[timed(c) for c in codigos])
+        return cold, warm, elapsed
+
+    cold, warm, elapsed = asyncio.run(main())
+    return {"api (cold)": {**percentiles(cold), "calls_per_s": round(len(cold) / elapsed, 1)},
+            "cache (warm)": percentiles(warm)}
+
+# --- Orchestration (parent process) ---
+
+def run_child(name, args, env):
+    options = [a for a in sys.argv[1:] if a not in SCENARIOS]
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", name] + options
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "failed"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def create_database(name):
+    from src.db.connection import get_connection
+    conn = get_connection()
+    if not conn:
+        raise SystemExit("❌ Connection failed")
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f'DROP DATABASE IF EXISTS "{name}";')
+    cur.execute(f"CREATE DATABASE \"{name}\" ENCODING 'UTF8' TEMPLATE template0;")
+    conn.close()
+
+def drop_database(name):
+    from src.db.connection import get_connection
+    conn = get_connection()
+    if conn:
+        conn.autocommit = True
+        conn.cursor().execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+        conn.close()
+
+def prepare_schema():
+    from src.db.connection import init_db, prepare_partitions
+    init_db()
+    prepare_partitions(months_for(12))
+
+def print_report(results):
+    print("\n" + "=" * 60)
+    print("BENCHMARK RESULTS")
+    print("=" * 60)
+    for name, result in results.items():
+        print(f"\n▶ {name}  (peak RSS {result.pop('peak_rss_mb', 0):.0f} MB)")
+        for key, value in result.items():
+            if isinstance(value, dict):
+                stats = "  ".join(f"{k}={v}" for k, v in value.items())
+                print(f"   {key:<34} {stats}")
+            else:
+                print(f"   {key:<34} {value}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ETL / MCP benchmark suite')
+    parser.add_argument('scenarios', nargs='*', help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)})')
+    parser.add_argument('--municipalities', type=int, default=500)
+    parser.add_argument('--months', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--api-rate', type=float, default=60000, help='Limiter quota (req/min) used against the mock')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Mock API latency')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Fraction of mock responses that are 429')
+    parser.add_argument('--national', action='store_true', help='etl scenario uses the national listing')
+    parser.add_argument('--rows', type=int, default=5000, help='Rows for the load scenario')
+    parser.add_argument('--page-size', type=int, default=100, help='Rows per page for the load scenario')
+    parser.add_argument('--calls', type=int, default=200, help='Calls per tool in mcp/portal scenarios')
+    parser.add_argument('--keep-db', action='store_true', help='Do not drop the disposable database')
+    parser.add_argument('--json', help='Also write results to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if args.child:
+        result = globals()[f"scenario_{args.child}"](args)
+        result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    from benchmarks.mock_portal import MockPortal
+
+    db_name = f"bench_{os.getpid()}"
+    create_database(db_name)
+    env = dict(os.environ, POSTGRES_DB=db_name, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+    os.environ["POSTGRES_DB"] = db_name
+
+    mock = MockPortal(municipalities=max(args.municipalities, args.calls),
+                      latency_ms=args.latency_ms, rate_429=args.rate_429).start()
+    env["PORTAL_API_URL"] = mock.url
+
+    results = {}
+    try:
+        subprocess.run([sys.executable, "-c", "from benchmarks.run_benchmarks import prepare_schema; prepare_schema()"],
+                       env=env, cwd=ROOT, check=True, capture_output=True)
+        for name in args.scenarios or SCENARIOS:
+            print(f"⏱️ Running {name}...", flush=True)
+            requests_before, throttled_before = mock.requests, mock.throttled
+            results[name] = run_child(name, args, env)
+            if mock.requests > requests_before:
+                results[name]["mock_requests"] = mock.requests - requests_before
+                results[name]["mock_429s"] = mock.throttled - throttled_before
+    finally:
+        mock.stop()
+        if not args.keep_db:
+            drop_database(db_name)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print_report(results)
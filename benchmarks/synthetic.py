@@ -0,0 +1,71 @@
+"""
+Deterministic synthetic data shaped like sample_response.json.
+"""
+
+PROGRAMAS = [
+    (1, "Bolsa Família", "Bolsa Família"),
+    (7, "Auxílio Brasil", "Auxílio Brasil"),
+    (9, "Novo Bolsa Família", "Novo Bolsa Família"),
+]
+
+# First two IBGE digits → (UF, nome, região)
+UFS = {
+    "11": ("RO", "RONDÔNIA", "NORTE"), "12": ("AC", "ACRE", "NORTE"),
+    "13": ("AM", "AMAZONAS", "NORTE"), "14": ("RR", "RORAIMA", "NORTE"),
+    "15": ("PA", "PARÁ", "NORTE"), "16": ("AP", "AMAPÁ", "NORTE"),
+    "17": ("TO", "TOCANTINS", "NORTE"), "21": ("MA", "MARANHÃO", "NORDESTE"),
+    "22": ("PI", "PIAUÍ", "NORDESTE"), "23": ("CE", "CEARÁ", "NORDESTE"),
+    "24": ("RN", "RIO GRANDE DO NORTE", "NORDESTE"), "25": ("PB", "PARAÍBA", "NORDESTE"),
+    "26": ("PE", "PERNAMBUCO", "NORDESTE"), "27": ("AL", "ALAGOAS", "NORDESTE"),
+    "28": ("SE", "SERGIPE", "NORDESTE"), "29": ("BA", "BAHIA", "NORDESTE"),
+    "31": ("MG", "MINAS GERAIS", "SUDESTE"), "32": ("ES", "ESPÍRITO SANTO", "SUDESTE"),
+    "33": ("RJ", "RIO DE JANEIRO", "SUDESTE"), "35": ("SP", "SÃO PAULO", "SUDESTE"),
+    "41": ("PR", "PARANÁ", "SUL"), "42": ("SC", "SANTA CATARINA", "SUL"),
+    "43": ("RS", "RIO GRANDE DO SUL", "SUL"), "50": ("MS", "MATO GROSSO DO SUL", "CENTRO-OESTE"),
+    "51": ("MT", "MATO GROSSO", "CENTRO-OESTE"), "52": ("GO", "GOIÁS", "CENTRO-OESTE"),
+    "53": ("DF", "DISTRITO FEDERAL", "CENTRO-OESTE"),
+}
+
+REGIOES = {"NORTE": "1", "NORDESTE": "2", "SUDESTE": "3", "SUL": "4", "CENTRO-OESTE": "5"}
+
+def municipality_codes(count):
+    """`count` fake 7-digit IBGE codes spread across every UF."""
+    prefixes = sorted(UFS)
+    return [f"{prefixes[i % len(prefixes)]}{10000 + i // len(prefixes):05d}" for i in range(count)]
+
+def programa_for(mes_ano):
+    if mes_ano < "202111":
+        return PROGRAMAS[0]
+    if mes_ano < "202303":
+        return PROGRAMAS[1]
+    return PROGRAMAS[2]
+
+def make_item(codigo_ibge, mes_ano, programa=None, seq=0):
+    """One API item for a municipality/month."""
+    sigla, nome_uf, regiao = UFS.get(codigo_ibge[:2], ("SP", "SÃO PAULO", "SUDESTE"))
+    prog = programa or programa_for(mes_ano)
+    seed = (int(codigo_ibge) * 31 + int(mes_ano)) % 100000
+    return {
+        "id": int(mes_ano) * 10_000_000 + int(codigo_ibge) % 10_000_000 + seq,
+        "dataReferencia": f"{mes_ano[:4]}-{mes_ano[4:]}-01",
+        "municipio": {
+            "codigoIBGE": codigo_ibge,
+            "nomeIBGE": f"MUNICIPIO {codigo_ibge}",
+            "codigoRegiao": REGIOES[regiao],
+            "nomeRegiao": regiao,
+            "pais": "BRASIL",
+            "uf": {"sigla": sigla, "nome": nome_uf}
+        },
+        "tipo": {"id": prog[0], "descricao": prog[1], "descricaoDetalhada": prog[2]},
+        "valor": 10000.0 + seed * 12.5,
+        "quantidadeBeneficiados": 50 + seed % 5000
+    }
+
+def make_items(rows, data_referencia="2024-01-01"):
+    """`rows` items spread over municipalities and programs (for load benchmarks)."""
+    mes_ano = data_referencia[:4] + data_referencia[5:7]
+    codigos = municipality_codes(rows // len(PROGRAMAS) + 1)
+    return [
+        make_item(codigos[i // len(PROGRAMAS)], mes_ano, PROGRAMAS[i % len(PROGRAMAS)], seq=i)
+        for i in range(rows)
+    ]
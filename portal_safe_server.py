@@ -1,10 +1,27 @@
 import httpx
 import asyncio
-import time
 import logging
 import os
-from datetime import datetime
+import time
+import psycopg2
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
+from src.api.cache import ResponseCache, cache_key, ttl_for
+from src.api.batch import (
+    ALL_PAGES, BOLSA_COLUMNS, NATIONAL, bolsa_rows, date_windows, parse_codes, parse_month, parse_months, parse_pages,
+    table
+)
+from src.api.endpoints import get_endpoint_by_date
+from src.api.local_store import read_bolsa_page, write_bolsa_page
+from src.api.rate_limit import AdaptiveLimiter, QuotaProfile
+from src.etl.pagination import DEFAULT_PAGE_SIZE, get_page_size, is_last_page
+from src import metrics
+
+try:
+    import h2  # noqa: F401 - habilita HTTP/2 no httpx quando instalado
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Configuração de Logs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,96 +29,333 @@ logger = logging.getLogger("portal-transparencia")
 
 mcp = FastMCP("portal-transparencia-safe")
 
-BASE_URL = "https://api.portaldatransparencia.gov.br/api-de-dados"
+BASE_URL = os.getenv("PORTAL_API_URL", "https://api.portaldatransparencia.gov.br/api-de-dados")
 API_KEY = os.getenv("API_KEY")
 
 # --- CONFIGURAÇÕES DE PROTEÇÃO DA API ---
-RATE_LIMIT_DELAY = 1.5 
+QUOTA = QuotaProfile.from_env()
+MAX_IN_FLIGHT = int(os.getenv("PORTAL_MAX_IN_FLIGHT", "4"))
 MAX_RETRIES = 3
-_cache = {}
+# Ferramentas em lote: requisições por chamada e páginas por listagem ("todas")
+MAX_BATCH_REQUESTS = int(os.getenv("PORTAL_MAX_BATCH_REQUESTS", "500"))
+MAX_LISTING_PAGES = int(os.getenv("PORTAL_MAX_LISTING_PAGES", "50"))
+
+# Leitura local: Bolsa Família já carregado pelo ETL sai do Postgres, sem gastar cota.
+# Com PORTAL_WRITE_BACK=1, respostas da API são gravadas em raw_bolsa_familia.
+LOCAL_READ = os.getenv("PORTAL_LOCAL_READ", "1") == "1"
+WRITE_BACK = os.getenv("PORTAL_WRITE_BACK", "0") == "1"
+# Após uma falha do banco, segue só com a API por este tempo (s)
+LOCAL_RETRY_AFTER = 60
+_local_down_until = 0.0
+
+# Cache de respostas: LRU limitado em bytes, TTL por endpoint e, opcionalmente,
+# persistido em SQLite (PORTAL_CACHE_PATH) para sobreviver a reinícios. O arquivo
+# também é limitado (PORTAL_CACHE_DISK_MAX_BYTES, padrão igual ao da memória).
+_cache = ResponseCache(
+    max_bytes=int(os.getenv("PORTAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    path=os.getenv("PORTAL_CACHE_PATH") or None,
+    max_disk_bytes=int(os.getenv("PORTAL_CACHE_DISK_MAX_BYTES", "0")) or None
+)
 
 class APIGuard:
-    def __init__(self):
-        self.last_request_time = 0
-        self.lock = asyncio.Lock()
-
-    async def wait_for_slot(self):
-        async with self.lock:
-            now = time.time()
-            elapsed = now - self.last_request_time
-            if elapsed < RATE_LIMIT_DELAY:
-                wait_time = RATE_LIMIT_DELAY - elapsed
-                await asyncio.sleep(wait_time)
-            self.last_request_time = time.time()
+    """
+    Limitador assíncrono: limitador adaptativo para a cota da API (perfil
+    dia/noite, recuo em 429 respeitando Retry-After) e semáforo para permitir
+    até MAX_IN_FLIGHT requisições simultâneas dentro dessa cota.
+    """
+    def __init__(self, quota=QUOTA, max_in_flight=MAX_IN_FLIGHT):
+        self.limiter = AdaptiveLimiter(quota, capacity=max_in_flight)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self.in_flight:
+            waited = await self.limiter.acquire_async()
+            metrics.inc("rate_limit_wait_seconds_total", waited, client="mcp")
+            yield
 
 api_guard = APIGuard()
 
-def get_bolsa_familia_endpoint(mes_ano_str: str) -> str:
-    """Retorna o endpoint correto baseado no histórico do programa."""
-    try:
-        data = datetime.strptime(mes_ano_str, "%Y%m")
-        if data < datetime(2021, 11, 1):
-            return "/bolsa-familia-por-municipio"
-        elif data < datetime(2023, 3, 1):
-            return "/auxilio-brasil-por-municipio"
-        else:
-            return "/novo-bolsa-familia-por-municipio"
-    except:
-        return "/novo-bolsa-familia-por-municipio"
+# Cliente HTTP único (keep-alive + HTTP/2 quando disponível), criado sob demanda
+_client = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            http2=HTTP2_AVAILABLE,
+            timeout=30.0,
+            headers={"chave-api-dados": API_KEY or "", "Accept": "application/json"},
+            limits=httpx.Limits(
+                max_connections=MAX_IN_FLIGHT,
+                max_keepalive_connections=MAX_IN_FLIGHT,
+                keepalive_expiry=120.0
+            )
+        )
+    return _client
+
+# Requisições em andamento por chave de cache: pedidos iguais e simultâneos
+# (comuns nas ferramentas em lote) esperam a mesma resposta
+_in_flight = {}
 
 async def safe_request(endpoint: str, params: dict):
     if not API_KEY:
         return "Erro: API_KEY não configurada no ambiente."
 
-    cache_key = f"{endpoint}:{str(params)}"
-    if cache_key in _cache:
+    key = cache_key(endpoint, params)
+    cached = _cache.get(key)
+    if cached is not None:
+        metrics.inc("cache_requests_total", cache="portal", result="hit")
         logger.info(f"Cache hit: {endpoint}")
-        return _cache[cache_key]
-
-    headers = {"chave-api-dados": API_KEY, "Accept": "application/json"}
-    
-    async with httpx.AsyncClient() as client:
-        for attempt in range(MAX_RETRIES):
-            await api_guard.wait_for_slot()
-            try:
-                url = f"{BASE_URL}{endpoint}"
-                response = await client.get(url, headers=headers, params=params, timeout=30.0)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    _cache[cache_key] = data
-                    return data
-                elif response.status_code == 429:
-                    wait_time = (attempt + 2) ** 2
-                    logger.warning(f"Rate limited (429). Retrying in {wait_time}s...")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                    return f"Erro na API ({response.status_code}): {response.text}"
-            except Exception as e:
-                logger.error(f"Erro na requisição: {e}")
-                if attempt == MAX_RETRIES - 1:
-                    return f"Erro de conexão: {str(e)}"
-                await asyncio.sleep(2)
+        return cached
+
+    task = _in_flight.get(key)
+    if task is None:
+        metrics.inc("cache_requests_total", cache="portal", result="miss")
+        task = asyncio.ensure_future(_fetch(endpoint, params, key))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        metrics.inc("cache_requests_total", cache="portal", result="coalesced")
+    return await asyncio.shield(task)
+
+async def _fetch(endpoint: str, params: dict, key: str):
+    client = get_client()
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with api_guard.slot():
+                with metrics.timer("http_request_seconds", client="mcp", endpoint=endpoint):
+                    response = await client.get(endpoint, params=params)
+            pause = api_guard.limiter.observe(response.status_code, response.headers)
+            metrics.inc("http_responses_total", client="mcp", status=response.status_code)
+            
+            if response.status_code == 200:
+                data = response.json()
+                _cache.set(key, data, ttl=ttl_for(endpoint, params))
+                return data
+            elif response.status_code == 429:
+                metrics.inc("http_throttled_total", client="mcp")
+                # O recuo fica no limitador, que segura todas as requisições
+                logger.warning(f"Rate limited (429). Backing off {pause:.0f}s "
+                               f"(now {api_guard.limiter.rate * 60:.0f} req/min)...")
+                continue
+            else:
+                return f"Erro na API ({response.status_code}): {response.text}"
+        except Exception as e:
+            logger.error(f"Erro na requisição: {e}")
+            metrics.inc("http_responses_total", client="mcp", status="error")
+            if attempt == MAX_RETRIES - 1:
+                return f"Erro de conexão: {str(e)}"
+            metrics.inc("retry_sleep_seconds_total", 2, client="mcp")
+            await asyncio.sleep(2)
         
     return "Falha após múltiplas tentativas."
 
+def _local_failed(e):
+    global _local_down_until
+    _local_down_until = time.monotonic() + LOCAL_RETRY_AFTER
+    reason = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+    logger.warning(f"Base local indisponível ({reason}). Usando só a API por {LOCAL_RETRY_AFTER}s.")
+
+async def bolsa_request(endpoint: str, params: dict):
+    """
+    safe_request para o Bolsa Família com leitura local antes (raw/fato do
+    ETL, respeitando o TTL do mês) e gravação opcional da resposta da API.
+    """
+    mes_ano = str(params["mesAno"])
+    codigo = str(params.get("codigoIbge", NATIONAL))
+    pagina = int(params.get("pagina", 1))
+    local_on = LOCAL_READ and time.monotonic() >= _local_down_until
+
+    if local_on:
+        try:
+            page = await asyncio.to_thread(read_bolsa_page, endpoint, mes_ano, codigo, pagina,
+                                           ttl_for(endpoint, params))
+        except psycopg2.Error as e:
+            _local_failed(e)
+        else:
+            metrics.inc("cache_requests_total", cache="local", result="hit" if page is not None else "miss")
+            if page is not None:
+                logger.info(f"Local hit: {endpoint} {mes_ano}/{codigo} p{pagina}")
+                return page
+
+    data = await safe_request(endpoint, params)
+    if WRITE_BACK and data and not isinstance(data, str) and time.monotonic() >= _local_down_until:
+        try:
+            written = await asyncio.to_thread(write_bolsa_page, mes_ano, codigo, pagina, data)
+            metrics.inc("raw_pages_total", result="saved" if written else "unchanged", source="mcp")
+        except psycopg2.Error as e:
+            _local_failed(e)
+    return data
+
+async def page_size_for(endpoint: str):
+    """
+    Tamanho de página aprendido pelo ETL (etl_page_size); sem base local,
+    PORTAL_PAGE_SIZE. None: desconhecido, lê até a primeira página vazia.
+    """
+    if LOCAL_READ and time.monotonic() >= _local_down_until:
+        try:
+            return await asyncio.to_thread(get_page_size, endpoint)
+        except psycopg2.Error as e:
+            _local_failed(e)
+    return DEFAULT_PAGE_SIZE or None
+
+class RequestBudget:
+    """
+    Requisições restantes de uma chamada em lote, divididas entre as
+    listagens com paginas="todas" (cada uma pode ler até MAX_LISTING_PAGES).
+    """
+    def __init__(self, limit=MAX_BATCH_REQUESTS):
+        self.left = limit
+
+    def take(self, wanted):
+        granted = max(0, min(wanted, self.left))
+        self.left -= granted
+        return granted
+
+async def fetch_pages(endpoint: str, params: dict, paginas=ALL_PAGES, fetch=safe_request, budget=None):
+    """
+    Busca as páginas pedidas em paralelo (dentro do APIGuard). Com
+    paginas=ALL_PAGES, lê a página 1 e segue em janelas crescentes (2, 4, ...
+    até MAX_IN_FLIGHT) até a primeira página incompleta, no máximo
+    MAX_LISTING_PAGES e o que restar de `budget`. Retorna
+    ([(pagina, resposta)], limite_atingido).
+    """
+    async def get(pagina):
+        return pagina, await fetch(endpoint, {**params, "pagina": pagina})
+
+    if paginas is not ALL_PAGES:
+        return list(await asyncio.gather(*(get(p) for p in paginas))), False
+
+    budget = budget or RequestBudget()
+    page_size = await page_size_for(endpoint)
+    results = []
+    page, window = 1, 1
+    while page <= MAX_LISTING_PAGES:
+        granted = budget.take(min(window, MAX_LISTING_PAGES + 1 - page))
+        if not granted:
+            break
+        batch = range(page, page + granted)
+        for pagina, data in await asyncio.gather(*(get(p) for p in batch)):
+            results.append((pagina, data))
+            if not isinstance(data, list) or is_last_page(data, page_size):
+                return results, False
+        page += len(batch)
+        window = min(window * 2, MAX_IN_FLIGHT)
+    return results, True
+
+def _limit_error(**where):
+    return {**where, "erro": f"limite atingido ({MAX_LISTING_PAGES} páginas por listagem, "
+                             f"{MAX_BATCH_REQUESTS} requisições por chamada)"}
+
 # --- FERRAMENTAS (TOOLS) ---
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_bolsa_familia_municipio")
 async def consultar_bolsa_familia_municipio(mes_ano: str, codigo_ibge: str, pagina: int = 1):
     """
     Consulta pagamentos do Bolsa Família por município.
     Lida automaticamente com as mudanças de nome do programa (Bolsa Família vs Auxílio Brasil).
+    Meses já carregados pelo ETL vêm da base local, sem consumir a cota da API
+    (pela listagem nacional, os itens vêm sem id, codigoRegiao e uf.nome).
     mes_ano: AAAAMM (ex: 202401).
     codigo_ibge: 7 dígitos.
     """
-    endpoint = get_bolsa_familia_endpoint(mes_ano)
-    return await safe_request(endpoint, {
+    try:
+        mes_ano = parse_month(mes_ano)
+    except ValueError as e:
+        return f"Erro nos parâmetros: {e}"
+    endpoint = get_endpoint_by_date(mes_ano)
+    return await bolsa_request(endpoint, {
         "mesAno": mes_ano, "codigoIbge": codigo_ibge, "pagina": pagina
     })
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_bolsa_familia_lote")
+async def consultar_bolsa_familia_lote(meses: str, codigos_ibge: str, paginas: str = "1"):
+    """
+    Consulta o Bolsa Família (ou Auxílio Brasil, conforme o mês) para vários
+    meses e municípios numa só chamada. As requisições rodam em paralelo dentro
+    da cota da API e reaproveitam o cache. Retorna uma tabela única:
+    {"colunas": [...], "linhas": [[...]], "paginas": n, "erros": [...]}.
+    meses: AAAA, AAAAMM, listas e intervalos (ex: "2023", "202301-202312" ou "202301,202306").
+    codigos_ibge: códigos de 7 dígitos separados por vírgula, "capitais" (27
+    capitais) ou "todos" (listagem nacional, centenas de páginas por mês:
+    peça intervalos de páginas, ex: "1-20"; o mês inteiro fica para o ETL).
+    Meses já carregados pelo ETL vêm da base local, sem consumir a cota.
+    paginas: "1" (padrão), "1-3" ou "todas" (não vale com "todos").
+    """
+    try:
+        months = parse_months(meses)
+        codes = parse_codes(codigos_ibge)
+        pages = parse_pages(paginas)
+    except ValueError as e:
+        return f"Erro nos parâmetros: {e}"
+    if NATIONAL in codes and pages is ALL_PAGES:
+        return (f"Erro nos parâmetros: a listagem nacional (\"todos\") tem centenas de "
+                f"páginas por mês; peça intervalos (ex: paginas=\"1-20\") "
+                f"ou carregue o mês pelo ETL (--mode national).")
+
+    # Com "todas" só a página 1 entra aqui; as demais saem do RequestBudget da chamada
+    planned = len(months) * len(codes) * (len(pages) if pages is not ALL_PAGES else 1)
+    if planned > MAX_BATCH_REQUESTS:
+        return (f"Erro: {planned} requisições excedem o limite de {MAX_BATCH_REQUESTS} por chamada. "
+                f"Divida o pedido ou use a base local (ETL).")
+
+    budget = RequestBudget()
+
+    async def listing(mes_ano, codigo):
+        params = {"mesAno": mes_ano}
+        if codigo != NATIONAL:
+            params["codigoIbge"] = codigo
+        return mes_ano, codigo, await fetch_pages(get_endpoint_by_date(mes_ano), params, pages,
+                                                  bolsa_request, budget)
+
+    rows, errors, pages_read = [], [], 0
+    for mes_ano, codigo, (results, truncated) in await asyncio.gather(
+            *(listing(m, c) for m in months for c in codes)):
+        pages_read += len(results)
+        for pagina, data in results:
+            if isinstance(data, str):
+                errors.append({"mes_ano": mes_ano, "codigo_ibge": codigo, "pagina": pagina, "erro": data})
+            elif data:
+                rows.extend(bolsa_rows(data, mes_ano))
+        if truncated:
+            errors.append(_limit_error(mes_ano=mes_ano, codigo_ibge=codigo))
+    return {"colunas": BOLSA_COLUMNS, "linhas": rows, "paginas": pages_read, "erros": errors}
+
+async def _periodo(endpoint: str, data_inicial: str, data_final: str, paginas: str):
+    """Divide o período em janelas de 30 dias e junta as páginas de todas numa tabela."""
+    try:
+        windows = date_windows(data_inicial, data_final)
+        pages = parse_pages(paginas)
+    except ValueError as e:
+        return f"Erro nos parâmetros: {e}"
+
+    planned = len(windows) * (len(pages) if pages is not ALL_PAGES else 1)
+    if planned > MAX_BATCH_REQUESTS:
+        return f"Erro: {planned} requisições excedem o limite de {MAX_BATCH_REQUESTS} por chamada."
+
+    budget = RequestBudget()
+    items, errors, pages_read = [], [], 0
+    for (inicio, fim), (results, truncated) in zip(windows, await asyncio.gather(
+            *(fetch_pages(endpoint, {"dataInicial": inicio, "dataFinal": fim}, pages, budget=budget)
+              for inicio, fim in windows))):
+        pages_read += len(results)
+        for pagina, data in results:
+            if isinstance(data, str):
+                errors.append({"periodo": f"{inicio}-{fim}", "pagina": pagina, "erro": data})
+            elif isinstance(data, list):
+                items.extend(data)
+        if truncated:
+            errors.append(_limit_error(periodo=f"{inicio}-{fim}"))
+    columns, rows = table(items)
+    return {"colunas": columns, "linhas": rows, "janelas": len(windows),
+            "paginas": pages_read, "erros": errors}
+
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_licitacoes")
 async def consultar_licitacoes(data_inicial: str, data_final: str, pagina: int = 1):
     """
     Consulta licitações por período.
@@ -112,6 +366,7 @@ async def consultar_licitacoes(data_inicial: str, data_final: str, pagina: int =
     })
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_contratos")
 async def consultar_contratos(data_inicial: str, data_final: str, pagina: int = 1):
     """
     Consulta contratos firmados por período.
@@ -122,6 +377,28 @@ async def consultar_contratos(data_inicial: str, data_final: str, pagina: int =
     })
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_licitacoes_periodo")
+async def consultar_licitacoes_periodo(data_inicial: str, data_final: str, paginas: str = "todas"):
+    """
+    Consulta licitações em qualquer período: o servidor divide em janelas de
+    30 dias, pagina cada uma e devolve uma tabela única
+    {"colunas", "linhas", "janelas", "paginas", "erros"}.
+    Datas: DD/MM/AAAA. paginas: "todas" (padrão), "1" ou "1-3" por janela.
+    """
+    return await _periodo("/licitacoes", data_inicial, data_final, paginas)
+
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_contratos_periodo")
+async def consultar_contratos_periodo(data_inicial: str, data_final: str, paginas: str = "todas"):
+    """
+    Consulta contratos em qualquer período, dividido em janelas de 30 dias e
+    paginado no servidor; mesma tabela de consultar_licitacoes_periodo.
+    Datas: DD/MM/AAAA.
+    """
+    return await _periodo("/contratos", data_inicial, data_final, paginas)
+
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_cpcc")
 async def consultar_cpcc(data_inicial: str, data_final: str, pagina: int = 1):
     """
     Consulta gastos com Cartão de Pagamento de Defesa Civil (CPDC).
@@ -132,9 +409,20 @@ async def consultar_cpcc(data_inicial: str, data_final: str, pagina: int = 1):
     })
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="consultar_emendas_parlamentares")
 async def consultar_emendas_parlamentares(ano: int, pagina: int = 1):
     """Consulta emendas parlamentares por ano (ex: 2023)."""
     return await safe_request("/emendas", {"ano": ano, "pagina": pagina})
 
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="portal-safe", tool="estatisticas_cache")
+async def estatisticas_cache():
+    """
+    Estatísticas do cache de respostas da API: entradas, bytes usados,
+    acertos (hits), falhas (misses), taxa de acerto e remoções (evictions).
+    """
+    return _cache.stats()
+
 if __name__ == "__main__":
+    metrics.start_exporter()
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -1,92 +1,301 @@
 #!/usr/bin/env python3
 import os
+import re
+import time
+import base64
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
 from fastmcp import FastMCP
 import json
 from dotenv import load_dotenv
 
 load_dotenv() # Load .env file
 
+# Shared pool (reads DB config from env, so it must come after load_dotenv)
+from src.db.connection import connection, get_connection
+from src.etl.aggregates import AGGREGATES
+from src.api.cache import ResponseCache, cache_key
+from src.db.catalog import SchemaCatalog
+from src import metrics
+
 # Initialize FastMCP
 mcp = FastMCP("pg-aiguide")
 
-# Database Configuration (reads from env or defaults to local docker)
-DB_CONFIG = {
-    "dbname": os.getenv("POSTGRES_DB", "portal_transparencia"),
-    "user": os.getenv("POSTGRES_USER", "umbrel"),
-    "password": os.getenv("POSTGRES_PASSWORD", "umbrel_password_change_me"),
-    "host": os.getenv("DB_HOST", "localhost"),
-    "port": "5432"
-}
+# Schema served from memory; reloaded on DDL change or TTL
+catalog = SchemaCatalog()
 
-def get_connection():
-    try:
-        return psycopg2.connect(**DB_CONFIG)
-    except Exception as e:
-        print(f"DEBUG: Connection failed: {e}")
-        return None
+# Result bounds for run_read_only_query (rows per page / serialized bytes per page)
+MAX_ROWS = int(os.getenv("MCP_MAX_ROWS", "500"))
+MAX_BYTES = int(os.getenv("MCP_MAX_BYTES", str(256 * 1024)))
+FETCH_BATCH = 100
+
+# Guards: per-call timeout and EXPLAIN-based rejection of runaway plans
+STATEMENT_TIMEOUT_MS = int(os.getenv("MCP_STATEMENT_TIMEOUT_MS", "15000"))
+MAX_PLAN_COST = float(os.getenv("MCP_MAX_PLAN_COST", "5000000"))
+MAX_PLAN_ROWS = float(os.getenv("MCP_MAX_PLAN_ROWS", "50000000"))
+
+# Result cache keyed by normalized SQL; cleared whenever the database was written to
+_results = ResponseCache(max_bytes=int(os.getenv("MCP_RESULT_CACHE_BYTES", str(32 * 1024 * 1024))))
+CACHE_CHECK_INTERVAL = float(os.getenv("MCP_CACHE_CHECK_INTERVAL", "2"))
+_data_version = {"value": None, "checked_at": 0.0}
+_data_version_lock = threading.Lock()
+
+_SQL_TOKENS = re.compile(r"""
+      [eE]'(?:[^'\\]|\\.|'')*'                 # E'...' (backslash escapes)
+    | '(?:[^']|'')*'                            # '...'
+    | "(?:[^"]|"")*"                            # quoted identifier
+    | \$([A-Za-z_\x80-\uffff][\w]*|)\$.*?\$\1\$   # $$...$$ / $tag$...$tag$
+    | --[^\n]*
+    | /\*.*?\*/
+    | \s+
+    | \w[\w$]*                                  # keyword, identifier (may contain $) or number
+    | .
+""", re.S | re.X)
+_LITERAL_PREFIXES = ("'", '"', "$", "e'", "E'")
+
+def _normalize_sql(query):
+    """
+    Collapses whitespace, drops comments and lowercases everything outside
+    literals/quoted identifiers (dollar-quoted and E'' strings included).
+    Returns (normalized, unsafe): unsafe when there is a ';' outside literals,
+    or a nested comment (Postgres nests /* */, this tokenizer does not).
+    """
+    parts = []
+    unsafe = False
+    for match in _SQL_TOKENS.finditer(query.strip().rstrip(";")):
+        token = match.group(0)
+        if token.startswith(_LITERAL_PREFIXES) and len(token) > 1:
+            parts.append(token)
+        elif token.startswith(("--", "/*")) or token.isspace():
+            unsafe = unsafe or "/*" in token[2:]
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            unsafe = unsafe or token == ";"
+            parts.append(token.lower())
+    return "".join(parts).strip(), unsafe
+
+@contextmanager
+def _read_only_connection():
+    """
+    Pooled connection with default_transaction_read_only on for the whole
+    session, so a COMMIT smuggled into the query cannot start a writable
+    transaction. Reset before the connection goes back to the pool (closed
+    instead if the reset fails).
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SET SESSION default_transaction_read_only = on;")
+        conn.commit()
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+                cur = conn.cursor()
+                cur.execute("RESET default_transaction_read_only;")
+                conn.commit()
+            except psycopg2.Error:
+                conn.close()
+
+def _check_data_version():
+    """
+    Clears the result cache when the ETL (or anything else) wrote to the
+    database since the last check. The WAL position moves on every committed
+    write, immediately (pg_stat counters can lag ~10s). Runs at most every
+    CACHE_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    with _data_version_lock:
+        if now - _data_version["checked_at"] < CACHE_CHECK_INTERVAL:
+            return
+        _data_version["checked_at"] = now
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_current_wal_lsn();")
+        version = cur.fetchone()[0]
+    with _data_version_lock:
+        if _data_version["value"] is not None and version != _data_version["value"]:
+            _results.clear()
+        _data_version["value"] = version
+
+def _encode_token(query, offset):
+    payload = json.dumps({"q": query, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_token(token):
+    payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    return payload["q"], int(payload["o"])
+
+def _dumps(value):
+    """Compact JSON (no indentation), handling dates/decimals."""
+    return json.dumps(value, separators=(",", ":"), default=str, ensure_ascii=False)
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="pg-aiguide", tool="list_tables")
 def list_tables():
-    """List all tables in the public schema."""
-    conn = get_connection()
-    if not conn:
-        return "Error: Could not connect to database."
+    """List all tables in the public schema, with estimated row counts."""
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public';
-        """)
-        tables = [row[0] for row in cur.fetchall()]
-        return tables
-    finally:
-        conn.close()
+        return catalog.tables()
+    except psycopg2.OperationalError:
+        return "Error: Could not connect to database."
 
 @mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="pg-aiguide", tool="describe_table")
 def describe_table(table_name: str):
-    """Get the schema definition for a specific table."""
-    conn = get_connection()
-    if not conn:
-        return "Error: Could not connect to database."
+    """
+    Get the schema definition for a specific table: columns, primary key,
+    indexes, foreign keys (both directions) and estimated row count.
+    """
     try:
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(f"""
-            SELECT column_name, data_type, is_nullable
-            FROM information_schema.columns
-            WHERE table_name = '{table_name}';
-        """)
-        columns = cur.fetchall()
-        return json.dumps(columns, indent=2)
+        table = catalog.describe(table_name)
+        if table is None:
+            known = ", ".join(t["table"] for t in catalog.tables())
+            return f"Error describing table: '{table_name}' not found. Known tables: {known}"
+        return _dumps(table)
+    except psycopg2.OperationalError:
+        return "Error: Could not connect to database."
     except Exception as e:
         return f"Error describing table: {str(e)}"
-    finally:
-        conn.close()
 
 @mcp.tool()
-def run_read_only_query(query: str):
+@metrics.timed("mcp_tool_seconds", server="pg-aiguide", tool="list_aggregate_tables")
+def list_aggregate_tables():
+    """
+    List pre-aggregated summary tables (grain, columns, coverage).
+    Prefer these over scanning fact_pagamentos_municipio for national, per-UF
+    or per-region time series; join dim_programa on programa_id for names.
+    """
+    try:
+        with connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            summaries = []
+            for agg in AGGREGATES:
+                cur.execute(f"""
+                    SELECT COUNT(*) AS rows,
+                           MIN(data_referencia) AS first_month,
+                           MAX(data_referencia) AS last_month,
+                           MAX(refreshed_at) AS refreshed_at
+                    FROM {agg["table"]};
+                """)
+                coverage = cur.fetchone()
+                summaries.append({
+                    "table": agg["table"],
+                    "grain": agg["grain"],
+                    "description": agg["description"],
+                    "columns": ["data_referencia", agg["key_column"], "programa_id", "valor_total",
+                                "quantidade_beneficiados", "municipios", "valor_por_beneficiario"],
+                    **coverage
+                })
+            return json.dumps(summaries, indent=2, default=str)
+    except psycopg2.OperationalError:
+        return "Error: Could not connect to database."
+    except Exception as e:
+        return f"Error listing aggregates: {str(e)}"
+
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="pg-aiguide", tool="run_read_only_query")
+def run_read_only_query(query: str = "", max_rows: int = MAX_ROWS, continuation_token: str = ""):
     """
     Run a READ-ONLY SQL query. 
-    WARNING: Only SELECT statements are allowed.
+    WARNING: Only single SELECT statements are allowed.
+    Runs in a read-only transaction with a statement timeout; queries whose
+    EXPLAIN estimate is too expensive are rejected (use aggregate tables or
+    add filters). Results are paginated: at most `max_rows` rows (and
+    ~256 KB) per call. If "next_token" is set in the response, call again
+    with continuation_token=<next_token> to fetch the next page.
     """
-    if not query.strip().lower().startswith("select"):
+    offset = 0
+    if continuation_token:
+        try:
+            query, offset = _decode_token(continuation_token)
+        except Exception:
+            return "Error: Invalid continuation_token."
+
+    query = query.strip().rstrip(";").strip()
+    normalized, multiple = _normalize_sql(query)
+    if not normalized.startswith("select"):
         return "Error: Only SELECT statements are allowed for safety."
-        
-    conn = get_connection()
-    if not conn:
-        return "Error: Could not connect to database."
+    if multiple:
+        return "Error: Only a single statement is allowed."
+    max_rows = max(1, min(max_rows, MAX_ROWS))
+
     try:
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(query)
-        results = cur.fetchall()
-        # Serialize to JSON to handle dates/decimals
-        return json.dumps(results, indent=2, default=str)
+        _check_data_version()
+        key = cache_key("sql", {"q": normalized, "o": offset, "n": max_rows})
+        cached = _results.get(key)
+        metrics.inc("cache_requests_total", cache="mcp_results", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+        with _read_only_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SET TRANSACTION READ ONLY;")
+            # The server must split literals exactly like _normalize_sql does
+            cur.execute("SET LOCAL standard_conforming_strings = on;")
+            cur.execute("SET LOCAL statement_timeout = %s;", (STATEMENT_TIMEOUT_MS,))
+
+            # Pre-flight: reject plans that would hammer the database
+            cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+            plan = cur.fetchone()[0][0]["Plan"]
+            if plan["Total Cost"] > MAX_PLAN_COST or plan["Plan Rows"] > MAX_PLAN_ROWS:
+                return (f"Error: Query rejected by cost guard (estimated cost {plan['Total Cost']:.0f}, "
+                        f"rows {plan['Plan Rows']:.0f}; limits {MAX_PLAN_COST:.0f} / {MAX_PLAN_ROWS:.0f}). "
+                        f"Add filters, aggregate, or use the tables from list_aggregate_tables.")
+            cur.close()
+
+            # Server-side cursor: rows are streamed in batches, never fetched all at once
+            cur = conn.cursor(name="mcp_read_only_query")
+            cur.itersize = FETCH_BATCH
+            cur.execute(query)
+            if offset:
+                cur.scroll(offset)
+
+            rows = []
+            size = 0
+            has_more = False
+            while not has_more:
+                batch = cur.fetchmany(FETCH_BATCH)
+                if not batch:
+                    break
+                for row in batch:
+                    encoded = _dumps(row)
+                    if len(rows) >= max_rows or (rows and size + len(encoded) > MAX_BYTES):
+                        has_more = True
+                        break
+                    rows.append(row)
+                    size += len(encoded) + 1
+            if not has_more and len(rows) >= max_rows:
+                has_more = cur.fetchone() is not None
+
+            columns = [col.name for col in cur.description] if cur.description else []
+            cur.close()
+
+        next_offset = offset + len(rows)
+        result = _dumps({
+            "columns": columns,
+            "rows": rows,
+            "row_count": len(rows),
+            "offset": offset,
+            "next_token": _encode_token(query, next_offset) if has_more else None
+        })
+        _results.set(key, result)
+        return result
+    except psycopg2.errors.QueryCanceled:
+        return f"Error: Query cancelled after the {STATEMENT_TIMEOUT_MS} ms statement timeout."
+    except psycopg2.OperationalError:
+        return "Error: Could not connect to database."
     except Exception as e:
         return f"Query Error: {str(e)}"
-    finally:
-        conn.close()
+
+@mcp.tool()
+@metrics.timed("mcp_tool_seconds", server="pg-aiguide", tool="query_cache_stats")
+def query_cache_stats():
+    """Hit/miss/eviction counters of the query result cache."""
+    return _dumps(_results.stats())
 
 if __name__ == "__main__":
+    metrics.start_exporter()
     mcp.run(transport='stdio')
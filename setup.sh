@@ -11,7 +11,7 @@ sudo docker compose up -d --build
 echo "🗄️ Initializing Database Connection & Schema..."
 # Wait for DB to be ready might be needed, but let's try running init script
 sleep 5 # Grace period
-sudo docker compose exec -T etl python src/db/connection.py
+sudo docker compose exec -T etl python -m src.db.migrate
 
 # 3. Verify
 echo "🧪 Running Verification Tests..."
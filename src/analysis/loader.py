@@ -0,0 +1,128 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+from src.db.connection import connection
+
+def fact_query(where=None, order_by="f.data_referencia"):
+    """The fact⋈dim join, optionally filtered (`where` may use %s params)."""
+    return f"""
+SELECT 
+    f.data_referencia,
+    m.nome_ibge as cidade,
+    m.uf_sigla as uf,
+    p.descricao as programa,
+    f.valor_total,
+    f.quantidade_beneficiados
+FROM fact_pagamentos_municipio f
+JOIN dim_municipio m ON f.codigo_ibge = m.codigo_ibge
+JOIN dim_programa p ON f.programa_id = p.id
+{f"WHERE {where}" if where else ""}
+ORDER BY {order_by};
+"""
+
+FACT_QUERY = fact_query()
+
+COLUMNS = ["data_referencia", "cidade", "uf", "programa", "valor_total", "quantidade_beneficiados"]
+CATEGORICAL = ["cidade", "uf", "programa"]
+METRICS = ["valor_total", "quantidade_beneficiados"]
+DEFAULT_CHUNKSIZE = 50_000
+
+def _to_frame(rows, valor_em_centavos=False):
+    """Builds a chunk with compact dtypes (categoricals, int32 counts)."""
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df["data_referencia"] = pd.to_datetime(df["data_referencia"])
+    for col in CATEGORICAL:
+        df[col] = df[col].astype("category")
+
+    valor = pd.to_numeric(df["valor_total"], errors="coerce")
+    if valor_em_centavos:
+        # Decimal-scaled: exact sums in int64 centavos
+        df["valor_total"] = (valor * 100).round().astype("Int64" if valor.isna().any() else "int64")
+    else:
+        df["valor_total"] = valor.astype("float64")
+
+    qtd = pd.to_numeric(df["quantidade_beneficiados"], errors="coerce")
+    df["quantidade_beneficiados"] = qtd.astype("Int32" if qtd.isna().any() else "int32")
+    return df
+
+def iter_chunks(chunksize=DEFAULT_CHUNKSIZE, query=FACT_QUERY, params=None, valor_em_centavos=False):
+    """
+    Streams the fact⋈dim join through a server-side (named) cursor, yielding
+    DataFrames of at most `chunksize` rows. Only one chunk is in memory at a time.
+    """
+    with connection() as conn:
+        cur = conn.cursor(name="analysis_stream")
+        cur.itersize = chunksize
+        try:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield _to_frame(rows, valor_em_centavos)
+        finally:
+            cur.close()
+
+def concat_chunks(chunks):
+    """Concatenates chunks keeping categorical columns categorical."""
+    chunks = list(chunks)
+    if not chunks:
+        return _to_frame([])
+    for col in CATEGORICAL:
+        categories = union_categoricals([c[col] for c in chunks]).categories
+        for c in chunks:
+            c[col] = c[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+def load_dataframe(chunksize=DEFAULT_CHUNKSIZE, valor_em_centavos=False):
+    """Full DataFrame, built chunk by chunk with compact dtypes."""
+    return concat_chunks(iter_chunks(chunksize, valor_em_centavos=valor_em_centavos))
+
+def _merge(acc, part):
+    """Chan et al. parallel merge of (count, mean, M2, sum, min, max) per group."""
+    if acc is None:
+        return part
+    acc, part = acc.align(part, join="outer", fill_value=0)
+    n = acc["count"] + part["count"]
+    delta = part["mean"] - acc["mean"]
+    safe_n = n.where(n > 0, 1)
+    merged = pd.DataFrame({
+        "count": n,
+        "sum": acc["sum"] + part["sum"],
+        "mean": acc["mean"] + delta * part["count"] / safe_n,
+        "m2": acc["m2"] + part["m2"] + delta ** 2 * acc["count"] * part["count"] / safe_n,
+    })
+    # align() filled missing groups with 0, which is wrong for min/max
+    merged["min"] = pd.concat([acc["min"].where(acc["count"] > 0), part["min"].where(part["count"] > 0)], axis=1).min(axis=1)
+    merged["max"] = pd.concat([acc["max"].where(acc["count"] > 0), part["max"].where(part["count"] > 0)], axis=1).max(axis=1)
+    return merged
+
+def aggregate_stream(chunks, by=None, metrics=METRICS):
+    """
+    Totals and describe-style stats (count, sum, mean, std, min, max) computed
+    while streaming, without ever holding the full table. `by` groups by a
+    column (e.g. "uf"). Returns {metric: DataFrame indexed by group}.
+    """
+    acc = {metric: None for metric in metrics}
+    for chunk in chunks:
+        keys = chunk[by] if by else pd.Series("total", index=chunk.index)
+        for metric in metrics:
+            values = chunk[metric].astype("float64")
+            grouped = values.groupby(keys, observed=True)
+            part = pd.DataFrame({
+                "count": grouped.count(),
+                "sum": grouped.sum(),
+                "mean": grouped.mean(),
+                "m2": grouped.var(ddof=0) * grouped.count(),
+                "min": grouped.min(),
+                "max": grouped.max(),
+            }).fillna({"mean": 0, "m2": 0})
+            acc[metric] = _merge(acc[metric], part)
+
+    result = {}
+    for metric, stats in acc.items():
+        if stats is None:
+            continue
+        stats = stats.copy()
+        stats["std"] = (stats["m2"] / (stats["count"] - 1).where(stats["count"] > 1)) ** 0.5
+        result[metric] = stats[["count", "sum", "mean", "std", "min", "max"]]
+    return result
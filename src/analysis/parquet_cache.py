@@ -0,0 +1,144 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from src.analysis.loader import fact_query, COLUMNS, iter_chunks, concat_chunks, load_dataframe
+from src.db.connection import connection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without pyarrow we read straight from Postgres
+    pa = None
+    pq = None
+
+CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join("data", "parquet"))
+MANIFEST = "_manifest.json"
+
+MONTH_QUERY = fact_query(where="f.data_referencia = %s", order_by="f.codigo_ibge")
+
+# Which months changed since the last export, read from the small rollup the
+# ETL recomputes whenever a month's facts change (src/etl/aggregates.py), so
+# startup never scans fact_pagamentos_municipio. Months loaded before the
+# rollups existed need one `python -m src.etl.aggregates` to show up.
+SIGNATURE_QUERY = """
+SELECT data_referencia, MAX(refreshed_at), SUM(valor_total), SUM(quantidade_beneficiados)
+FROM agg_mensal_uf_programa
+GROUP BY data_referencia;
+"""
+
+def _read_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def _month_files(cache_dir, month):
+    return glob.glob(os.path.join(cache_dir, "ano=*", "uf=*", f"part-{month}.parquet"))
+
+def _month_signatures():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(SIGNATURE_QUERY)
+        return {
+            f"{ref:%Y%m}": [refreshed_at.isoformat(), str(valor), str(qtd)]
+            for ref, refreshed_at, valor, qtd in cur.fetchall()
+        }
+
+def _write_month(cache_dir, month, reference_date):
+    """Writes one month as ano=YYYY/uf=XX/part-YYYYMM.parquet files."""
+    df = concat_chunks(iter_chunks(query=MONTH_QUERY, params=(reference_date,)))
+    for path in _month_files(cache_dir, month):
+        os.remove(path)
+
+    for uf, part in df.groupby("uf", observed=True):
+        target = os.path.join(cache_dir, f"ano={month[:4]}", f"uf={uf}")
+        os.makedirs(target, exist_ok=True)
+        part = part.drop(columns=["uf"]).reset_index(drop=True)
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        # Categorical columns arrive as dictionary arrays and stay dictionary-encoded
+        pq.write_table(table, os.path.join(target, f"part-{month}.parquet"),
+                       use_dictionary=True, compression="zstd")
+    return len(df)
+
+def export(cache_dir=CACHE_DIR, full=False):
+    """
+    Materializes fact ⋈ dims into Parquet partitioned by year/UF. Only months
+    whose rollup was refreshed (or whose totals changed) since the last
+    export are rewritten.
+    Returns the list of refreshed months.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = {} if full else _read_manifest(cache_dir)
+    signatures = _month_signatures()
+
+    stale = sorted(m for m, sig in signatures.items() if manifest.get(m) != sig)
+    removed = sorted(set(manifest) - set(signatures))
+
+    for month in removed:
+        for path in _month_files(cache_dir, month):
+            os.remove(path)
+        manifest.pop(month, None)
+
+    for month in stale:
+        rows = _write_month(cache_dir, month, f"{month[:4]}-{month[4:]}-01")
+        manifest[month] = signatures[month]
+        _write_manifest(cache_dir, manifest)
+        logging.info(f"📦 Exported {month}: {rows} rows.")
+
+    if removed:
+        _write_manifest(cache_dir, manifest)
+    return stale
+
+def read_cache(cache_dir=CACHE_DIR, columns=None, filters=None):
+    """Memory-maps the Parquet files into a DataFrame (same columns as loader.py)."""
+    table = pq.read_table(cache_dir, columns=columns, filters=filters, memory_map=True, partitioning="hive")
+    df = table.to_pandas()
+    if "uf" in df.columns:
+        df["uf"] = df["uf"].astype(str).astype("category")
+    return df[[c for c in COLUMNS if c in df.columns]]
+
+def load_analysis_frame(cache_dir=CACHE_DIR, refresh=True):
+    """
+    Default entry point for analysis sessions: refresh the Parquet cache
+    incrementally, then read it locally. Falls back to streaming from
+    Postgres when pyarrow is unavailable or the cache is disabled.
+    """
+    if pa is None or os.getenv("ANALYSIS_CACHE", "1") == "0":
+        return load_dataframe()
+
+    if refresh:
+        try:
+            export(cache_dir)
+        except Exception as e:
+            if not os.path.exists(os.path.join(cache_dir, MANIFEST)):
+                raise
+            logging.warning(f"Could not refresh Parquet cache ({e}). Using local copy.")
+
+    started = time.perf_counter()
+    df = read_cache(cache_dir)
+    logging.info(f"⚡ Read {len(df)} rows from Parquet in {time.perf_counter() - started:.2f}s.")
+    return df
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Export the fact table to a local Parquet cache')
+    parser.add_argument('--full', action='store_true', help='Rewrite every month')
+    parser.add_argument('--dir', default=CACHE_DIR, help=f'Cache directory (default: {CACHE_DIR})')
+    args = parser.parse_args()
+
+    refreshed = export(args.dir, full=args.full)
+    print(f"✅ {len(refreshed)} month(s) refreshed in {args.dir}")
@@ -1,53 +1,59 @@
-import pandas as pd
-from src.db.connection import get_connection
+from src.analysis.loader import iter_chunks, aggregate_stream
+from src.analysis.parquet_cache import load_analysis_frame
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
 def load_data():
-    conn = get_connection()
-    if not conn:
-        print("❌ Connection failed")
-        return None
-    
-    query = """
-    SELECT 
-        f.data_referencia,
-        m.nome_ibge as cidade,
-        m.uf_sigla as uf,
-        p.descricao as programa,
-        f.valor_total,
-        f.quantidade_beneficiados
-    FROM fact_pagamentos_municipio f
-    JOIN dim_municipio m ON f.codigo_ibge = m.codigo_ibge
-    JOIN dim_programa p ON f.programa_id = p.id
-    ORDER BY f.data_referencia;
-    """
-    
     try:
         print("📊 Loading data into Pandas DataFrame...")
-        df = pd.read_sql(query, conn)
-        return df
+        return load_analysis_frame()
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        conn.close()
+
+def verify_streaming():
+    """Same checks as load_data(), but aggregated chunk by chunk (memory-flat)."""
+    first_chunk = None
+    rows = 0
+    def chunks():
+        nonlocal first_chunk, rows
+        for chunk in iter_chunks():
+            if first_chunk is None:
+                first_chunk = chunk
+            rows += len(chunk)
+            yield chunk
+
+    stats = aggregate_stream(chunks())
+    return first_chunk, stats, rows
 
 if __name__ == "__main__":
-    df = load_data()
-    if df is not None:
+    import sys
+    if "--stream" in sys.argv:
+        try:
+            print("📊 Streaming data from Postgres...")
+            head, stats, rows = verify_streaming()
+        except Exception as e:
+            print(f"Error: {e}")
+            head, stats, rows = None, None, 0
+    else:
+        df = load_data()
+        head = df if df is not None and len(df) else None
+        stats = aggregate_stream([df]) if head is not None else None
+        rows = len(df) if df is not None else 0
+
+    if head is not None:
+        valor = stats["valor_total"].loc["total"]
         print("\n✅ Data Loaded Successfully!")
-        print(f"Shape: {df.shape}")
+        print(f"Rows: {rows}")
+        print(f"Rows with valor_total: {int(valor['count'])}")
         
         print("\n--- First 5 Rows ---")
-        print(df.head())
+        print(head.head())
         
         print("\n--- Basic Statistics (Valor) ---")
-        # Converting Decimal to float for describe if needed, likely handled by read_sql
-        print(df['valor_total'].astype(float).describe())
+        print(valor)
 
-        print("\n--- Total Transacted (2024) ---")
-        total = df['valor_total'].sum()
-        print(f"R$ {total:,.2f}")
+        print("\n--- Total Transacted ---")
+        print(f"R$ {valor['sum']:,.2f}")
@@ -0,0 +1,153 @@
+"""
+Helpers for the portal-safe batch tools: parse the month / municipality /
+page specs an LLM sends ("202301-202312", "capitais", "1-3"), split date
+ranges into the API's 30-day windows and flatten responses into one compact
+table (column names once, then rows).
+"""
+from datetime import datetime, timedelta
+
+from src.api.endpoints import month_range
+
+# Pseudo code for the national listing (same as src.etl.pagination.NATIONAL)
+NATIONAL = "BR"
+ALL_PAGES = None
+DATE_FORMAT = "%d/%m/%Y"
+
+# IBGE codes of the 27 state capitals
+CAPITAIS = [
+    "1100205", "1302603", "1200401", "5002704", "1600303", "5300108", "1400100",
+    "5103403", "1721000", "3550308", "2211001", "3304557", "1501402", "5208707",
+    "2927408", "4205407", "2111300", "2704302", "4314902", "4106902", "3106200",
+    "2304400", "2611606", "2507507", "2800308", "2408102", "3205309",
+]
+
+BOLSA_COLUMNS = ["mes_ano", "codigo_ibge", "municipio", "uf", "programa", "valor", "beneficiados"]
+
+def _tokens(spec):
+    """Accepts "a,b,c", "a b", or a list; returns stripped, non-empty strings."""
+    if isinstance(spec, (list, tuple)):
+        items = [str(item) for item in spec]
+    else:
+        items = str(spec).replace(";", ",").replace(" ", ",").split(",")
+    return [item.strip() for item in items if item.strip()]
+
+def parse_month(spec):
+    """'202401' → '202401'; anything other than one AAAAMM month raises ValueError."""
+    month = str(spec).strip()
+    if len(month) != 6 or not month.isdigit():
+        raise ValueError(f"invalid month: {spec!r} (AAAAMM)")
+    datetime.strptime(month, "%Y%m")
+    return month
+
+def parse_months(spec):
+    """
+    '202301-202312,202405' → ['202301', ..., '202312', '202405'] (sorted,
+    unique). Years ('2023', '2019-2021') expand to all their months.
+    """
+    months = []
+    for token in _tokens(spec):
+        start, _, end = token.partition("-")
+        end = end or start
+        if len(start) == 4:
+            start += "01"
+        if len(end) == 4:
+            end += "12"
+        months.extend(month_range(start, end))
+    if not months:
+        raise ValueError("no month given (AAAA, AAAAMM or AAAAMM-AAAAMM)")
+    return sorted(set(months))
+
+def parse_codes(spec):
+    """'capitais', 'todos'/'BR' (national listing) or IBGE codes → unique codes, in order."""
+    codes = []
+    for token in _tokens(spec):
+        lowered = token.lower()
+        if lowered == "capitais":
+            codes.extend(CAPITAIS)
+        elif lowered in ("todos", "br", "brasil"):
+            codes.append(NATIONAL)
+        elif token.isdigit() and len(token) == 7:
+            codes.append(token)
+        else:
+            raise ValueError(f"invalid IBGE code: {token!r} (7 digits, 'capitais' or 'todos')")
+    if not codes:
+        raise ValueError("no municipality given")
+    return list(dict.fromkeys(codes))
+
+def parse_pages(spec):
+    """'1-3,5' → [1, 2, 3, 5]; 'todas' → ALL_PAGES (read until the last page)."""
+    if str(spec).strip().lower() in ("todas", "all", "*"):
+        return ALL_PAGES
+    pages = []
+    for token in _tokens(spec):
+        start, _, end = token.partition("-")
+        first, last = int(start), int(end or start)
+        if first < 1 or last < first:
+            raise ValueError(f"invalid page range: {token!r}")
+        pages.extend(range(first, last + 1))
+    if not pages:
+        raise ValueError("no page given")
+    return sorted(set(pages))
+
+def date_windows(data_inicial, data_final, days=30):
+    """Splits [data_inicial, data_final] (DD/MM/AAAA) into consecutive windows of at most `days` days."""
+    start = datetime.strptime(data_inicial, DATE_FORMAT).date()
+    end = datetime.strptime(data_final, DATE_FORMAT).date()
+    if start > end:
+        raise ValueError(f"{data_inicial} is after {data_final}")
+    windows = []
+    while start <= end:
+        last = min(start + timedelta(days=days - 1), end)
+        windows.append((start.strftime(DATE_FORMAT), last.strftime(DATE_FORMAT)))
+        start = last + timedelta(days=1)
+    return windows
+
+def bolsa_rows(items, mes_ano):
+    """Compact rows (BOLSA_COLUMNS) for one Bolsa Família / Auxílio Brasil page."""
+    rows = []
+    for item in items if isinstance(items, list) else [items]:
+        mun = item.get("municipio") or {}
+        rows.append([
+            mes_ano,
+            mun.get("codigoIBGE"),
+            mun.get("nomeIBGE"),
+            (mun.get("uf") or {}).get("sigla"),
+            (item.get("tipo") or {}).get("descricao"),
+            item.get("valor"),
+            item.get("quantidadeBeneficiados"),
+        ])
+    return rows
+
+def flatten(item, prefix="", depth=2):
+    """{'a': {'b': 1}, 'c': [..]} → {'a.b': 1} down to `depth` levels; lists are dropped."""
+    flat = {}
+    for key, value in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if depth > 1:
+                flat.update(flatten(value, f"{name}.", depth - 1))
+        elif not isinstance(value, list):
+            flat[name] = value
+    return flat
+
+def table(items, key="id"):
+    """
+    One table for heterogeneous items: columns in first-seen order, rows as
+    lists. Items repeated across windows/pages (same `key`) are kept once.
+    """
+    columns = {}
+    flats = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if key in item:
+            if item[key] in seen:
+                continue
+            seen.add(item[key])
+        flat = flatten(item)
+        for name in flat:
+            columns.setdefault(name, None)
+        flats.append(flat)
+    columns = list(columns)
+    return columns, [[flat.get(name) for name in columns] for flat in flats]
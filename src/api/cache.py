@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+# Historical months never change; the current (and previous) month still do
+TTL_CURRENT = 3600
+TTL_DEFAULT = 24 * 3600
+
+def cache_key(endpoint, params):
+    """Stable key: same endpoint + same params (any order, any type) → same key."""
+    canonical = json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True, separators=(",", ":"))
+    return f"{endpoint}?{canonical}"
+
+def ttl_for(endpoint, params, today=None):
+    """
+    Returns the TTL (seconds) for a response, or None if it never expires.
+    - mesAno older than the previous month: immutable.
+    - Date ranges / years still open (recent): TTL_CURRENT.
+    - Anything else: TTL_DEFAULT.
+    """
+    today = today or date.today()
+
+    mes_ano = params.get("mesAno")
+    if mes_ano:
+        first_of_month = today.replace(day=1)
+        previous = (first_of_month - timedelta(days=1)).strftime("%Y%m")
+        return None if str(mes_ano) < previous else TTL_CURRENT
+
+    data_final = params.get("dataFinal")
+    if data_final:
+        try:
+            fim = datetime.strptime(str(data_final), "%d/%m/%Y").date()
+        except ValueError:
+            return TTL_CURRENT
+        return TTL_DEFAULT if fim < today - timedelta(days=30) else TTL_CURRENT
+
+    ano = params.get("ano")
+    if ano:
+        return TTL_DEFAULT if int(ano) < today.year else TTL_CURRENT
+
+    return TTL_DEFAULT
+
+class ResponseCache:
+    """
+    In-memory LRU cache bounded in bytes, with per-entry TTL and an optional
+    SQLite file so entries survive restarts. The file is bounded too
+    (`max_disk_bytes`, default `max_bytes`): past it, expired rows go first,
+    then the oldest ones. A value larger than a bound is not stored there
+    (it would only flush everything else) and counts in `too_large`.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None, clock=time.time, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes or max_bytes
+        self.path = path
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.too_large = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self._disk_bytes = 0
+        self._db = None
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                expires_at REAL,
+                value TEXT NOT NULL
+            )
+        """)
+        # Files written before the disk bound lack size/age; old rows count as oldest
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(response_cache)")}
+        if "size" not in columns:
+            self._db.execute("ALTER TABLE response_cache ADD COLUMN size INTEGER")
+            self._db.execute("UPDATE response_cache SET size = length(CAST(value AS BLOB))")
+        if "stored_at" not in columns:
+            self._db.execute("ALTER TABLE response_cache ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._trim_disk()
+        self._db.commit()
+
+    def _trim_disk(self):
+        """Drops expired rows, then the oldest, until the file fits max_disk_bytes."""
+        self._db.execute("DELETE FROM response_cache WHERE expires_at IS NOT NULL AND expires_at < ?", (self._clock(),))
+        evicted = self._db.execute("""
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY stored_at DESC, rowid DESC) AS kept
+                    FROM response_cache
+                ) WHERE kept > ?
+            )
+        """, (self.max_disk_bytes,)).rowcount
+        self.disk_evictions += max(evicted, 0)
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+
+    def _store(self, key, expires_at, size, value):
+        """Keeps the value in memory; False if it alone exceeds max_bytes."""
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return False
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, old_size, _) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+        return True
+
+    def get(self, key):
+        """Returns the cached value or None."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._bytes -= self._entries.pop(key)[1]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and (row[0] is None or row[0] > now):
+                    value = json.loads(row[1])
+                    self._store(key, row[0], len(row[1].encode()), value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        """Caches a JSON-serializable value. `ttl=None` means it never expires."""
+        payload = json.dumps(value, separators=(",", ":"))
+        expires_at = None if ttl is None else self._clock() + ttl
+        size = len(payload.encode())
+        with self._lock:
+            stored = self._store(key, expires_at, size, value)
+            if self._db is not None and size > self.max_disk_bytes:
+                # Drop the stale copy rather than keep serving it
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._db.commit()
+            elif self._db is not None:
+                stored = True
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, expires_at, value, size, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, expires_at, payload, size, self._clock())
+                )
+                # Replacing a key counts it twice until the next trim recounts
+                self._disk_bytes += size
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._trim_disk()
+                self._db.commit()
+            if not stored:
+                self.too_large += 1
+
+    def clear(self):
+        """Drops every entry (memory and disk), e.g. when the underlying data changed."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "too_large": self.too_large,
+                "disk_hits": self.disk_hits,
+                "disk_path": self.path,
+            }
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+                stats["disk_bytes"] = self._disk_bytes
+                stats["max_disk_bytes"] = self.max_disk_bytes
+                stats["disk_evictions"] = self.disk_evictions
+            return stats
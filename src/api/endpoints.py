@@ -0,0 +1,50 @@
+"""
+Portal endpoints for the federal cash-transfer program, which changed name
+(and endpoint) twice. Shared by the ETL, the planner, the portal-safe MCP
+server and tests/inspect_api.py.
+"""
+import logging
+from datetime import datetime, timedelta
+
+# (first month, endpoint, program), oldest first
+PROGRAM_ERAS = [
+    ("000101", "/bolsa-familia-por-municipio", "Bolsa Família"),
+    ("202111", "/auxilio-brasil-por-municipio", "Auxílio Brasil"),
+    ("202303", "/novo-bolsa-familia-por-municipio", "Novo Bolsa Família"),
+]
+
+def get_endpoint_by_date(mes_ano_str):
+    """
+    Retorna o endpoint correto baseado na data de referência:
+    - Até 10/2021: Bolsa Família
+    - 11/2021 a 02/2023: Auxílio Brasil
+    - 03/2023 em diante: Novo Bolsa Família
+    """
+    try:
+        mes_ano = datetime.strptime(str(mes_ano_str), "%Y%m").strftime("%Y%m")
+    except ValueError as e:
+        logging.error(f"Erro ao parsear data {mes_ano_str}: {e}")
+        return PROGRAM_ERAS[-1][1]
+    endpoint = PROGRAM_ERAS[0][1]
+    for start, era_endpoint, _ in PROGRAM_ERAS:
+        if mes_ano >= start:
+            endpoint = era_endpoint
+    return endpoint
+
+def program_name(endpoint):
+    for _, era_endpoint, name in PROGRAM_ERAS:
+        if era_endpoint == endpoint:
+            return name
+    return endpoint
+
+def month_range(start, end):
+    """['YYYYMM', ...] from `start` to `end`, inclusive."""
+    current = datetime.strptime(start, "%Y%m")
+    last = datetime.strptime(end, "%Y%m")
+    if current > last:
+        raise ValueError(f"{start} is after {end}")
+    months = []
+    while current <= last:
+        months.append(current.strftime("%Y%m"))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
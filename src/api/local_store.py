@@ -0,0 +1,90 @@
+"""
+Local read-through for the portal-safe server. Bolsa Família pages are
+answered from what the ETL already stored (raw_bolsa_familia, or the fact
+table for months loaded through the national listing), and API answers can
+be written back into the raw table, where the incremental transform picks
+them up. Blocking (psycopg2 pool): the server calls it via asyncio.to_thread.
+"""
+from datetime import datetime
+
+from src.db.connection import connection
+from src.etl.job_state import STATUS_COMPLETED
+from src.etl.pagination import NATIONAL
+from src.etl.raw_storage import load_page, upsert_page, remember_refs
+
+def _fresh(age, max_age):
+    return max_age is None or age <= max_age
+
+def fact_page(cur, reference_date, codigo_ibge):
+    """
+    A municipality's month rebuilt in the API's item shape from the star
+    schema. Reduced shape: the star schema does not keep the item `id`,
+    municipio.codigoRegiao or municipio.uf.nome, so those keys are absent.
+    """
+    cur.execute("""
+        SELECT f.data_referencia, m.codigo_ibge, m.nome_ibge, m.uf_sigla, m.nome_regiao, m.pais,
+               p.id, p.descricao, p.descricao_detalhada, f.valor_total, f.quantidade_beneficiados
+        FROM fact_pagamentos_municipio f
+        JOIN dim_municipio m ON m.codigo_ibge = f.codigo_ibge
+        JOIN dim_programa p ON p.id = f.programa_id
+        WHERE f.data_referencia = %s AND f.codigo_ibge = %s
+        ORDER BY p.id;
+    """, (reference_date, codigo_ibge))
+    return [
+        {
+            "dataReferencia": data.isoformat(),
+            "municipio": {"codigoIBGE": codigo, "nomeIBGE": nome, "nomeRegiao": regiao,
+                          "pais": pais, "uf": {"sigla": uf}},
+            "tipo": {"id": programa, "descricao": descricao, "descricaoDetalhada": detalhada},
+            "valor": float(valor) if valor is not None else None,
+            "quantidadeBeneficiados": beneficiados,
+        }
+        for data, codigo, nome, uf, regiao, pais, programa, descricao, detalhada, valor, beneficiados
+        in cur.fetchall()
+    ]
+
+def read_bolsa_page(endpoint, mes_ano, codigo_ibge, pagina, max_age=None):
+    """
+    The page as the API would return it, or None on a miss. Local data older
+    than `max_age` seconds (None: never stale) counts as a miss.
+    - the raw page itself;
+    - [] past the last page of a completed job;
+    - for a municipality, its fact rows (see `fact_page`) when the month's
+      national listing was completed (page 1; [] after that). The ETL
+      pipeline completes a job only after its last page's facts are
+      committed, so a completed listing means the facts are there.
+    """
+    reference_date = datetime.strptime(mes_ano, "%Y%m").date()
+    with connection() as conn:
+        cur = conn.cursor()
+        stored = load_page(cur, reference_date, codigo_ibge, pagina)
+        if stored is not None:
+            page, age = stored
+            return page if _fresh(age, max_age) else None
+
+        cur.execute("""
+            SELECT codigo_ibge, last_page, EXTRACT(EPOCH FROM NOW() - updated_at)
+            FROM etl_job_state
+            WHERE endpoint = %s AND mes_ano = %s AND codigo_ibge IN (%s, %s) AND status = %s;
+        """, (endpoint, mes_ano, codigo_ibge, NATIONAL, STATUS_COMPLETED))
+        jobs = {codigo: (last_page, float(age)) for codigo, last_page, age in cur.fetchall()}
+
+        job = jobs.get(codigo_ibge)
+        if job and pagina > job[0] and _fresh(job[1], max_age):
+            return []
+        national = jobs.get(NATIONAL)
+        if codigo_ibge != NATIONAL and national and _fresh(national[1], max_age):
+            return fact_page(cur, reference_date, codigo_ibge) if pagina == 1 else []
+    return None
+
+def write_bolsa_page(mes_ano, codigo_ibge, pagina, data):
+    """Stores an API page in raw_bolsa_familia (unchanged pages are skipped). Returns rows written."""
+    if not data:
+        return 0
+    with connection() as conn:
+        cur = conn.cursor()
+        written, new_refs = upsert_page(cur, data, datetime.strptime(mes_ano, "%Y%m").date(),
+                                        codigo_ibge, pagina)
+        conn.commit()
+    remember_refs(new_refs)
+    return written
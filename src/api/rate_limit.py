@@ -0,0 +1,170 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+
+# Portal da Transparência quota: higher between midnight and 6 AM (Brasília)
+BRASILIA = timezone(timedelta(hours=-3))
+NIGHT_HOURS = (0, 6)
+
+
+class QuotaProfile:
+    """Requests per second allowed by the API at a given time of day."""
+
+    def __init__(self, day_per_minute, night_per_minute=None, night_hours=NIGHT_HOURS, tz=BRASILIA):
+        if day_per_minute <= 0:
+            raise ValueError("rate must be positive")
+        self.day = day_per_minute / 60.0
+        self.night = (night_per_minute or day_per_minute) / 60.0
+        self.night_hours = night_hours
+        self.tz = tz
+
+    @classmethod
+    def from_env(cls, day_default=90, night_default=300):
+        return cls(float(os.getenv("API_RATE_PER_MINUTE", str(day_default))),
+                   float(os.getenv("API_RATE_PER_MINUTE_NIGHT", str(night_default))))
+
+    def rate_at(self, when=None):
+        when = when or datetime.now(self.tz)
+        start, end = self.night_hours
+        return self.night if start <= when.astimezone(self.tz).hour < end else self.day
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (moment - now).total_seconds())
+
+
+class AdaptiveLimiter:
+    """
+    Token bucket whose rate follows the API quota profile and backs off on
+    throttling (AIMD): each 429 halves the rate and pauses every caller for
+    the Retry-After interval; each success adds back a small step.
+
+    Waits are reserved under a plain lock and slept outside it, so the same
+    instance works from threads (`acquire`) and from asyncio (`acquire_async`).
+    """
+
+    def __init__(self, profile, capacity=1, min_fraction=0.1, increase=0.02,
+                 decrease=0.5, default_backoff=10.0, clock=time.monotonic):
+        self.profile = profile
+        self.capacity = float(capacity)
+        self.min_fraction = min_fraction
+        self.increase = increase
+        self.decrease = decrease
+        self.default_backoff = default_backoff
+        self.clock = clock
+        self.fraction = 1.0
+        self.fixed_rate = None
+        self.share = 1.0
+        self._tokens = self.capacity
+        self._last = clock()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+        self.throttled = 0
+
+    @property
+    def ceiling(self):
+        return (self.fixed_rate or self.profile.rate_at()) * self.share
+
+    @property
+    def rate(self):
+        """Current rate in requests per second."""
+        return self.ceiling * self.fraction
+
+    def set_rate(self, rate):
+        """Pins the ceiling to `rate` requests/s, ignoring the day/night profile."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self._refill(self.clock())
+            self.fixed_rate = float(rate)
+
+    def set_share(self, share):
+        """Uses only `share` (0-1] of the quota, e.g. when several processes split one API key."""
+        if not 0 < share <= 1:
+            raise ValueError("share must be in (0, 1]")
+        with self._lock:
+            self._refill(self.clock())
+            self.share = float(share)
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - max(self._last, self._paused_until))
+        self._last = max(now, self._last)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def reserve(self):
+        """Takes a token, possibly in advance, and returns how long to wait for it."""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens -= 1
+            self.acquired += 1
+            wait = max(0.0, self._paused_until - now) + max(0.0, -self._tokens / self.rate)
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def observe(self, status, headers=None):
+        """
+        Feeds a response back into the limiter. Returns the pause imposed
+        (seconds), 0 when the request was not throttled.
+        """
+        headers = headers or {}
+        with self._lock:
+            now = self.clock()
+            if status == 429:
+                self.throttled += 1
+                pause = parse_retry_after(headers.get("Retry-After"))
+                pause = self.default_backoff if pause is None else pause
+                self._paused_until = max(self._paused_until, now + pause)
+                # Concurrent 429s from one burst count as a single congestion signal
+                if now - self._last_decrease >= max(pause, 1.0):
+                    self._refill(now)
+                    self.fraction = max(self.min_fraction, self.fraction * self.decrease)
+                    self._last_decrease = now
+                self._tokens = min(self._tokens, 0.0)
+                return pause
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None and str(remaining).strip() == "0":
+                pause = parse_retry_after(reset)
+                if pause is not None:
+                    # Reset may be an epoch timestamp rather than a delta
+                    pause = pause - time.time() if pause > 10 ** 9 else pause
+                    self._paused_until = max(self._paused_until, now + max(0.0, pause))
+                    return max(0.0, pause)
+
+            if status < 400 and self.fraction < 1.0:
+                self._refill(now)
+                self.fraction = min(1.0, self.fraction + self.increase)
+            return 0.0
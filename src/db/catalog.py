@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from src.db.connection import connection
+
+# How long a loaded catalog is trusted without looking at the database at all,
+# and how long before row estimates are reloaded even without DDL changes.
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+
+# Changes whenever a relation in the schema is created, dropped or altered
+# (DDL rewrites the relation's pg_class row, ANALYZE updates it in place).
+FINGERPRINT_QUERY = """
+SELECT md5(COALESCE(string_agg(c.oid::text || ':' || c.xmin::text || ':' || c.relnatts::text, ',' ORDER BY c.oid), ''))
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s;
+"""
+
+TABLES_QUERY = """
+SELECT c.relname, c.relkind,
+       CASE WHEN c.relkind = 'p' THEN (
+           SELECT SUM(GREATEST(ch.reltuples, 0))::bigint
+           FROM pg_inherits i JOIN pg_class ch ON ch.oid = i.inhrelid
+           WHERE i.inhparent = c.oid)
+       WHEN c.reltuples >= 0 THEN c.reltuples::bigint
+       END,
+       obj_description(c.oid, 'pg_class')
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm') AND NOT c.relispartition
+ORDER BY c.relname;
+"""
+
+COLUMNS_QUERY = """
+SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod),
+       CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END
+FROM pg_attribute a
+JOIN pg_class c ON c.oid = a.attrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm') AND NOT c.relispartition
+  AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum;
+"""
+
+INDEXES_QUERY = """
+SELECT t.relname, i.relname, pg_get_indexdef(i.oid), ix.indisprimary, ix.indisunique
+FROM pg_index ix
+JOIN pg_class i ON i.oid = ix.indexrelid
+JOIN pg_class t ON t.oid = ix.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %s AND NOT t.relispartition
+ORDER BY t.relname, i.relname;
+"""
+
+FOREIGN_KEYS_QUERY = """
+SELECT t.relname, con.conname, pg_get_constraintdef(con.oid), r.relname
+FROM pg_constraint con
+JOIN pg_class t ON t.oid = con.conrelid
+JOIN pg_class r ON r.oid = con.confrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %s AND con.contype = 'f' AND NOT t.relispartition
+ORDER BY t.relname, con.conname;
+"""
+
+KINDS = {"r": "table", "p": "partitioned table", "v": "view", "m": "materialized view"}
+
+class SchemaCatalog:
+    """
+    In-memory copy of the schema (tables, columns, indexes, foreign keys and
+    row estimates). Reloaded when the DDL fingerprint changes or after
+    CATALOG_TTL; between checks every lookup is a dict access.
+    """
+
+    def __init__(self, schema="public"):
+        self.schema = schema
+        self._tables = {}
+        self._fingerprint = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _load(self, cur, fingerprint):
+        tables = {}
+        cur.execute(TABLES_QUERY, (self.schema,))
+        for name, kind, estimate, comment in cur.fetchall():
+            tables[name] = {
+                "table": name,
+                "kind": KINDS.get(kind, kind),
+                "row_estimate": estimate,
+                "comment": comment,
+                "columns": [],
+                "primary_key": None,
+                "indexes": [],
+                "foreign_keys": [],
+                "referenced_by": [],
+            }
+
+        cur.execute(COLUMNS_QUERY, (self.schema,))
+        for table, column, data_type, nullable in cur.fetchall():
+            if table in tables:
+                tables[table]["columns"].append(
+                    {"column_name": column, "data_type": data_type, "is_nullable": nullable})
+
+        cur.execute(INDEXES_QUERY, (self.schema,))
+        for table, index, definition, primary, unique in cur.fetchall():
+            if table in tables:
+                tables[table]["indexes"].append({"name": index, "definition": definition, "unique": unique})
+                if primary:
+                    tables[table]["primary_key"] = definition[definition.index("(") :]
+
+        cur.execute(FOREIGN_KEYS_QUERY, (self.schema,))
+        for table, name, definition, referenced in cur.fetchall():
+            if table in tables:
+                tables[table]["foreign_keys"].append({"name": name, "definition": definition})
+            if referenced in tables:
+                tables[referenced]["referenced_by"].append({"table": table, "constraint": name})
+
+        self._tables = tables
+        self._fingerprint = fingerprint
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+
+    def refresh(self, force=False):
+        """Reloads the catalog if the DDL fingerprint changed or the TTL expired."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._fingerprint is not None and now - self._checked_at < CATALOG_CHECK_INTERVAL:
+                return
+            with connection() as conn:
+                cur = conn.cursor()
+                cur.execute(FINGERPRINT_QUERY, (self.schema,))
+                fingerprint = cur.fetchone()[0]
+                if force or fingerprint != self._fingerprint or now - self._loaded_at > CATALOG_TTL:
+                    self._load(cur, fingerprint)
+                cur.close()
+            self._checked_at = now
+
+    def tables(self):
+        self.refresh()
+        return [
+            {"table": t["table"], "kind": t["kind"], "row_estimate": t["row_estimate"]}
+            for t in self._tables.values()
+        ]
+
+    def describe(self, table_name):
+        """Full description of one table, or None if it does not exist."""
+        self.refresh()
+        return self._tables.get(table_name)
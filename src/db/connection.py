@@ -1,7 +1,14 @@
 import os
 import json
+import time
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
 from psycopg2.extras import Json
+from src.db.schema import ensure_month_partitions
+from src.db.migrate import migrate
 
 # Database connection parameters - in production use env vars
 DB_CONFIG = {
@@ -12,8 +19,18 @@ DB_CONFIG = {
     "port": "5432"
 }
 
+# Pool sizing - one pool per process, shared by every thread
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Connections idle for longer than this are pinged before being handed out
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
 def get_connection():
-    """Connect to the PostgreSQL database server"""
+    """
+    Open a dedicated (unpooled) connection. Meant for one-off scripts;
+    hot paths should use `connection()` instead.
+    """
     conn = None
     try:
         conn = psycopg2.connect(**DB_CONFIG)
@@ -22,41 +39,125 @@ def get_connection():
         print(f"Error connecting to database: {error}")
         return None
 
-def init_db():
-    """Create tables if they don't exist"""
-    conn = get_connection()
-    if conn:
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool that blocks (instead of failing) when every
+    connection is checked out, and health-checks connections on checkout.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, **config):
+        self.maxconn = maxconn
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **(config or DB_CONFIG))
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < DB_POOL_PING_AFTER:
+            return True
         try:
             cur = conn.cursor()
-            # Create table for raw Bolsa Familia data
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS raw_bolsa_familia (
-                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                    ingested_at TIMESTAMP DEFAULT NOW(),
-                    reference_date DATE,
-                    municipality_code TEXT,
-                    page_number INTEGER,
-                    api_response JSONB,
-                    UNIQUE(reference_date, municipality_code, page_number)
-                );
-            """)
-            # Migration for existing tables (safe to run)
-            try:
-                cur.execute("ALTER TABLE raw_bolsa_familia ADD COLUMN IF NOT EXISTS page_number INTEGER;")
-                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dedup ON raw_bolsa_familia (reference_date, municipality_code, page_number);")
-                conn.commit()
-            except Exception as e:
-                print(f"Migration warning: {e}")
-                conn.rollback()
-
-            conn.commit()
-            conn.commit()
-            print("Database initialized successfully.")
+            cur.execute("SELECT 1;")
             cur.close()
-        except (Exception, psycopg2.DatabaseError) as error:
-            print(f"Error initializing DB: {error}")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=DB_POOL_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise pg_pool.PoolError(f"No connection available after {timeout}s (max {self.maxconn})")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        try:
+            if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        except psycopg2.Error:
+            self._pool.putconn(conn, close=True)
         finally:
-            conn.close()
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set once the migrations have been checked in this process
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+@contextmanager
+def connection():
+    """
+    Check out a pooled connection. Uncommitted work is rolled back when the
+    connection goes back to the pool, so callers must commit explicitly.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def init_db():
+    """
+    Brings the schema up to date via src/db/migrate.py. Runs the migrations
+    once per process; later calls return immediately.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with connection() as conn:
+            applied = migrate(conn)
+        if applied:
+            print(f"Database migrated to version {max(applied)}.")
+        _schema_ready = True
+
+def prepare_partitions(months):
+    """Creates the monthly raw/fact partitions for `months` ahead of a load."""
+    with connection() as conn:
+        cur = conn.cursor()
+        created = ensure_month_partitions(cur, months)
+        conn.commit()
+        cur.close()
+    if created:
+        print(f"Created partitions: {', '.join(created)}")
+    return created
 
 if __name__ == '__main__':
     init_db()
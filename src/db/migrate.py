@@ -0,0 +1,108 @@
+"""
+Versioned schema migrations. Files in src/db/migrations are applied in
+order of their numeric prefix (NNNN_name.sql, or NNNN_name.py exposing
+`upgrade(cur)`), each in its own transaction, and recorded in
+schema_version. Concurrent processes serialize on an advisory lock.
+"""
+import argparse
+import importlib.util
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# pg_advisory_lock key shared by every process running migrations
+LOCK_KEY = 720_417_001
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.(sql|py)$")
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return found
+
+def applied_versions(cur):
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return set()
+    cur.execute("SELECT version FROM schema_version;")
+    return {row[0] for row in cur.fetchall()}
+
+def _apply(cur, path):
+    if path.endswith(".sql"):
+        with open(path, encoding="utf-8") as f:
+            cur.execute(f.read())
+        return
+    spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(cur)
+
+def pending_migrations(conn, directory=MIGRATIONS_DIR):
+    cur = conn.cursor()
+    done = applied_versions(cur)
+    conn.commit()
+    return [m for m in available_migrations(directory) if m[0] not in done]
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """
+    Applies pending migrations on `conn`. Returns the versions applied;
+    when the schema is current this is a single read and no locks.
+    """
+    if not pending_migrations(conn, directory):
+        return []
+
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s);", (LOCK_KEY,))
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            );
+        """)
+        conn.commit()
+
+        applied = []
+        # Re-read under the lock: another process may have migrated meanwhile
+        for version, name, path in pending_migrations(conn, directory):
+            print(f"Applying migration {version:04d}_{name}...")
+            try:
+                _apply(cur, path)
+                cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s);", (version, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+        return applied
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s);", (LOCK_KEY,))
+        conn.commit()
+        cur.close()
+
+if __name__ == "__main__":
+    from src.db.connection import connection
+
+    parser = argparse.ArgumentParser(description='Apply database schema migrations')
+    parser.add_argument('--status', action='store_true', help='List pending migrations without applying them')
+    args = parser.parse_args()
+
+    with connection() as conn:
+        if args.status:
+            pending = pending_migrations(conn)
+            for version, name, _ in pending:
+                print(f"pending  {version:04d}_{name}")
+            if not pending:
+                print("Schema is up to date.")
+        else:
+            applied = migrate(conn)
+            print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
@@ -0,0 +1,5 @@
+"""Star schema with month-partitioned raw/fact tables (migrates legacy heap tables)."""
+from src.db.schema import create_schema
+
+def upgrade(cur):
+    create_schema(cur)
@@ -0,0 +1,41 @@
+-- Checkpoints for resumable extraction jobs
+CREATE TABLE IF NOT EXISTS etl_job_state (
+    endpoint TEXT NOT NULL,
+    mes_ano TEXT NOT NULL,
+    codigo_ibge TEXT NOT NULL,
+    last_page INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running',
+    pages_loaded INTEGER NOT NULL DEFAULT 0,
+    rows_loaded INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (endpoint, mes_ano, codigo_ibge)
+);
+
+-- Learned page size per API endpoint (see src/etl/pagination.py)
+CREATE TABLE IF NOT EXISTS etl_page_size (
+    endpoint TEXT PRIMARY KEY,
+    page_size INTEGER NOT NULL,
+    observed_at TIMESTAMP DEFAULT NOW()
+);
+
+-- High-water marks for incremental transforms over raw tables
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    name TEXT PRIMARY KEY,
+    last_ingested_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Pages that failed in a pipeline stage (fetch / raw / transform)
+CREATE TABLE IF NOT EXISTS etl_dead_letter (
+    id BIGSERIAL PRIMARY KEY,
+    stage TEXT NOT NULL,
+    endpoint TEXT,
+    mes_ano TEXT,
+    codigo_ibge TEXT,
+    page_number INTEGER,
+    error TEXT,
+    payload JSONB,
+    created_at TIMESTAMP DEFAULT NOW(),
+    resolved_at TIMESTAMP
+);
@@ -0,0 +1,24 @@
+-- Rollups maintained by the ETL (see src/etl/aggregates.py)
+CREATE TABLE IF NOT EXISTS agg_mensal_uf_programa (
+    data_referencia DATE NOT NULL,
+    uf_sigla TEXT NOT NULL,
+    programa_id INTEGER NOT NULL,
+    valor_total NUMERIC,
+    quantidade_beneficiados BIGINT,
+    municipios INTEGER,
+    valor_por_beneficiario NUMERIC,
+    refreshed_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (data_referencia, uf_sigla, programa_id)
+);
+
+CREATE TABLE IF NOT EXISTS agg_mensal_regiao_programa (
+    data_referencia DATE NOT NULL,
+    nome_regiao TEXT NOT NULL,
+    programa_id INTEGER NOT NULL,
+    valor_total NUMERIC,
+    quantidade_beneficiados BIGINT,
+    municipios INTEGER,
+    valor_por_beneficiario NUMERIC,
+    refreshed_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (data_referencia, nome_regiao, programa_id)
+);
@@ -0,0 +1,25 @@
+"""Content hash, original size and shared sub-object references for raw pages; lz4 TOAST."""
+import psycopg2
+
+def upgrade(cur):
+    cur.execute("""
+        ALTER TABLE raw_bolsa_familia ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+        ALTER TABLE raw_bolsa_familia ADD COLUMN IF NOT EXISTS raw_bytes INTEGER;
+
+        CREATE TABLE IF NOT EXISTS raw_ref_objeto (
+            ref TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            body JSONB NOT NULL,
+            first_seen TIMESTAMP DEFAULT NOW()
+        );
+    """)
+
+    # lz4 needs a server built with it (the postgres:16 image is); keep pglz otherwise
+    cur.execute("SAVEPOINT lz4;")
+    try:
+        cur.execute("ALTER TABLE raw_bolsa_familia ALTER COLUMN api_response SET COMPRESSION lz4;")
+        cur.execute("ALTER TABLE raw_ref_objeto ALTER COLUMN body SET COMPRESSION lz4;")
+        cur.execute("RELEASE SAVEPOINT lz4;")
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT lz4;")
+        print(f"lz4 unavailable, raw pages keep pglz compression: {str(e).strip().splitlines()[0]}")
@@ -0,0 +1,17 @@
+-- etl_job_state doubles as a work queue: workers claim rows with
+-- FOR UPDATE SKIP LOCKED and keep a lease alive through heartbeat_at.
+ALTER TABLE etl_job_state ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE etl_job_state ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+ALTER TABLE etl_job_state ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_etl_job_state_claimable
+    ON etl_job_state (status, mes_ano)
+    WHERE status <> 'completed';
+
+-- Live ETL workers and the API key slot each one uses
+CREATE TABLE IF NOT EXISTS etl_worker (
+    worker_id TEXT PRIMARY KEY,
+    api_key_slot INTEGER NOT NULL,
+    started_at TIMESTAMP DEFAULT NOW(),
+    heartbeat_at TIMESTAMP DEFAULT NOW()
+);
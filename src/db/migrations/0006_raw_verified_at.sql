@@ -0,0 +1,6 @@
+-- Last time a raw page was confirmed against the API. ingested_at only moves
+-- when the content changes (it drives the incremental transform), so the
+-- portal-safe local read ages pages by this instead. Pages stored before it
+-- fall back to ingested_at.
+ALTER TABLE raw_bolsa_familia ADD COLUMN IF NOT EXISTS verified_at TIMESTAMP;
+ALTER TABLE raw_bolsa_familia ALTER COLUMN verified_at SET DEFAULT NOW();
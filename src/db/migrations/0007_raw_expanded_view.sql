@@ -0,0 +1,19 @@
+-- raw_bolsa_familia with compact pages (RAW_STORAGE=compact) expanded back
+-- into the API's shape: "$municipio"/"$tipo" references are replaced by
+-- their raw_ref_objeto bodies. Pages stored in full pass through unchanged.
+CREATE OR REPLACE VIEW raw_bolsa_familia_expanded AS
+SELECT r.ingested_at,
+       r.reference_date,
+       r.municipality_code,
+       r.page_number,
+       CASE WHEN jsonb_typeof(r.api_response) = 'array' THEN (
+           SELECT COALESCE(jsonb_agg(
+                      e.item - '$municipio' - '$tipo'
+                      || CASE WHEN m.body IS NULL THEN '{}'::jsonb ELSE jsonb_build_object('municipio', m.body) END
+                      || CASE WHEN t.body IS NULL THEN '{}'::jsonb ELSE jsonb_build_object('tipo', t.body) END
+                      ORDER BY e.position), '[]'::jsonb)
+           FROM jsonb_array_elements(r.api_response) WITH ORDINALITY AS e(item, position)
+           LEFT JOIN raw_ref_objeto m ON m.ref = e.item->>'$municipio'
+           LEFT JOIN raw_ref_objeto t ON t.ref = e.item->>'$tipo'
+       ) ELSE r.api_response END AS api_response
+FROM raw_bolsa_familia r;
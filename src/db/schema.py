@@ -0,0 +1,154 @@
+"""
+Star schema and month-partitioned raw/fact tables.
+
+raw_bolsa_familia and fact_pagamentos_municipio are partitioned by RANGE on
+the reference month, one partition per month plus a DEFAULT partition so an
+insert never fails for a month nobody prepared. `ensure_month_partitions`
+creates the monthly partitions ahead of a load (moving any rows the DEFAULT
+partition already holds for that month).
+"""
+from datetime import date
+
+# Partitioned tables and the column they are split on
+PARTITIONED = {
+    "raw_bolsa_familia": "reference_date",
+    "fact_pagamentos_municipio": "data_referencia",
+}
+
+DIMENSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS dim_municipio (
+        codigo_ibge TEXT PRIMARY KEY,
+        nome_ibge TEXT,
+        uf_sigla TEXT,
+        nome_regiao TEXT,
+        pais TEXT
+    );
+    CREATE TABLE IF NOT EXISTS dim_programa (
+        id INTEGER PRIMARY KEY,
+        descricao TEXT,
+        descricao_detalhada TEXT
+    );
+"""
+
+# The natural key is the primary key (it must contain the partition column),
+# so inserts append to a month's index instead of scattering random UUIDs.
+RAW_DDL = """
+    CREATE TABLE IF NOT EXISTS raw_bolsa_familia (
+        ingested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        reference_date DATE NOT NULL,
+        municipality_code TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        api_response JSONB,
+        PRIMARY KEY (reference_date, municipality_code, page_number)
+    ) PARTITION BY RANGE (reference_date);
+    CREATE TABLE IF NOT EXISTS raw_bolsa_familia_default PARTITION OF raw_bolsa_familia DEFAULT;
+    -- Incremental transform scans by ingestion time, which grows with the heap
+    CREATE INDEX IF NOT EXISTS idx_raw_bolsa_familia_ingested_brin
+        ON raw_bolsa_familia USING BRIN (ingested_at);
+"""
+
+FACT_DDL = """
+    CREATE TABLE IF NOT EXISTS fact_pagamentos_municipio (
+        data_referencia DATE NOT NULL,
+        codigo_ibge TEXT NOT NULL REFERENCES dim_municipio (codigo_ibge),
+        programa_id INTEGER NOT NULL REFERENCES dim_programa (id),
+        valor_total NUMERIC,
+        quantidade_beneficiados INTEGER,
+        PRIMARY KEY (data_referencia, codigo_ibge, programa_id)
+    ) PARTITION BY RANGE (data_referencia);
+    CREATE TABLE IF NOT EXISTS fact_pagamentos_municipio_default
+        PARTITION OF fact_pagamentos_municipio DEFAULT;
+    -- Month-range scans across partitions that span several months (DEFAULT)
+    CREATE INDEX IF NOT EXISTS idx_fact_pagamentos_data_brin
+        ON fact_pagamentos_municipio USING BRIN (data_referencia);
+    -- Per municipality/program lookups answered from the index alone
+    CREATE INDEX IF NOT EXISTS idx_fact_pagamentos_municipio_programa
+        ON fact_pagamentos_municipio (codigo_ibge, programa_id)
+        INCLUDE (data_referencia, valor_total, quantidade_beneficiados);
+"""
+
+def _relkind(cur, table):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y%m}"
+
+def _migrate_heap(cur, table, ddl, columns):
+    """
+    Swaps a legacy (unpartitioned) table for the partitioned layout, copying
+    its rows. Drops the old UUID key and the duplicate idx_dedup with it.
+    """
+    legacy = f"{table}_legacy"
+    print(f"Migrating {table} to monthly partitions...")
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    for name in (f"{table}_pkey", f"{table}_reference_date_municipality_code_page_number_key"):
+        cur.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {legacy}_{name[len(table) + 1:]};")
+    cur.execute(ddl)
+    column = PARTITIONED[table]
+    cur.execute(f"SELECT DISTINCT date_trunc('month', {column})::date FROM {legacy} WHERE {column} IS NOT NULL;")
+    ensure_month_partitions(cur, [row[0] for row in cur.fetchall()], tables=[table])
+    cols = ", ".join(columns)
+    cur.execute(f"""
+        INSERT INTO {table} ({cols})
+        SELECT {cols} FROM {legacy}
+        WHERE {column} IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """)
+    print(f"   {cur.rowcount} rows copied.")
+    cur.execute(f"DROP TABLE {legacy};")
+
+def create_schema(cur):
+    """Creates dims, raw and fact tables, migrating heap versions in place."""
+    cur.execute(DIMENSIONS_DDL)
+
+    kind = _relkind(cur, "raw_bolsa_familia")
+    if kind == "r":
+        _migrate_heap(cur, "raw_bolsa_familia", RAW_DDL,
+                      ["ingested_at", "reference_date", "municipality_code", "page_number", "api_response"])
+    else:
+        cur.execute(RAW_DDL)
+
+    kind = _relkind(cur, "fact_pagamentos_municipio")
+    if kind == "r":
+        _migrate_heap(cur, "fact_pagamentos_municipio", FACT_DDL,
+                      ["data_referencia", "codigo_ibge", "programa_id", "valor_total", "quantidade_beneficiados"])
+    else:
+        cur.execute(FACT_DDL)
+
+def ensure_month_partitions(cur, months, tables=None):
+    """
+    Creates the monthly partition of each partitioned table for `months`
+    (dates or YYYYMM strings). Rows already in the DEFAULT partition for
+    that month are moved into the new partition before it is attached.
+    Returns the partitions created.
+    """
+    created = []
+    for value in sorted({_month_start(m) if isinstance(m, date) else date(int(m[:4]), int(m[4:6]), 1)
+                         for m in months}):
+        start, end = value, _next_month(value)
+        for table in tables or PARTITIONED:
+            column = PARTITIONED[table]
+            name = partition_name(table, start)
+            if _relkind(cur, name):
+                continue
+            cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMPRESSION);")
+            cur.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default
+                    WHERE {column} >= %s AND {column} < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved;
+            """, (start, end))
+            cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s);",
+                        (start, end))
+            created.append(name)
+    return created
@@ -0,0 +1,84 @@
+import argparse
+import logging
+from src.db.connection import connection, init_db
+
+# Pre-aggregated rollups of fact_pagamentos_municipio. Each entry documents its
+# grain so the pg-aiguide MCP server can steer the model toward them.
+AGGREGATES = [
+    {
+        "table": "agg_mensal_uf_programa",
+        "grain": "month x UF x programa",
+        "description": "Monthly totals per state and program (value, beneficiaries, municipalities, value per beneficiary).",
+        "group_column": "m.uf_sigla",
+        "key_column": "uf_sigla",
+    },
+    {
+        "table": "agg_mensal_regiao_programa",
+        "grain": "month x região x programa",
+        "description": "Monthly totals per region (NORTE, NORDESTE, ...) and program.",
+        "group_column": "m.nome_regiao",
+        "key_column": "nome_regiao",
+    },
+]
+
+def refresh_aggregates(cur, months):
+    """
+    Recomputes every aggregate for the given reference dates (DELETE + INSERT
+    ... SELECT per month), on the caller's transaction.
+    """
+    months = sorted(set(months))
+    if not months:
+        return
+    for agg in AGGREGATES:
+        cur.execute(f"DELETE FROM {agg['table']} WHERE data_referencia = ANY(%s::date[]);", (months,))
+        cur.execute(f"""
+            INSERT INTO {agg["table"]}
+            (data_referencia, {agg["key_column"]}, programa_id, valor_total,
+             quantidade_beneficiados, municipios, valor_por_beneficiario)
+            SELECT
+                f.data_referencia,
+                COALESCE({agg["group_column"]}, '?'),
+                f.programa_id,
+                SUM(f.valor_total),
+                SUM(f.quantidade_beneficiados),
+                COUNT(DISTINCT f.codigo_ibge),
+                SUM(f.valor_total) / NULLIF(SUM(f.quantidade_beneficiados), 0)
+            FROM fact_pagamentos_municipio f
+            JOIN dim_municipio m ON f.codigo_ibge = m.codigo_ibge
+            WHERE f.data_referencia = ANY(%s::date[])
+            GROUP BY 1, 2, 3;
+        """, (months,))
+
+def refresh_months(months):
+    """Refreshes the aggregates for `months` in its own transaction."""
+    months = sorted(set(months))
+    if not months:
+        return
+    try:
+        with connection() as conn:
+            cur = conn.cursor()
+            refresh_aggregates(cur, months)
+            conn.commit()
+            cur.close()
+        logging.info(f"📊 Refreshed aggregates for {len(months)} month(s).")
+    except Exception as e:
+        logging.error(f"Aggregate refresh failed: {e}")
+
+def refresh_all():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT DISTINCT data_referencia FROM fact_pagamentos_municipio;")
+        months = [row[0] for row in cur.fetchall()]
+    refresh_months(months)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Refresh aggregate tables')
+    parser.add_argument('--month', type=str, help='Refresh a single month (YYYYMM); default: all months')
+    args = parser.parse_args()
+
+    init_db()
+    if args.month:
+        refresh_months([f"{args.month[:4]}-{args.month[4:]}-01"])
+    else:
+        refresh_all()
@@ -1,18 +1,29 @@
 import os
 import requests
 import time
-from datetime import datetime
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 import logging
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from src.db.connection import get_connection, init_db
+from psycopg2.extras import execute_values
+from src.db.connection import connection, init_db, prepare_partitions
+from src.api.endpoints import get_endpoint_by_date
+from src.api.rate_limit import AdaptiveLimiter, QuotaProfile
+from src import metrics
+from src.etl.aggregates import refresh_months
+from src.etl.job_state import get_job_state, record_page, STATUS_COMPLETED, STATUS_FAILED
+from src.etl.pipeline import PagePipeline, replay_dead_letters
+from src.etl.raw_storage import upsert_page, remember_refs
+from src.etl.pagination import NATIONAL, get_page_size, stored_page_size, learn_page_size, is_last_page
+from src.etl.planner import MODES, month_range, plan, print_plan
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # API Configuration
-BASE_URL = "https://api.portaldatransparencia.gov.br/api-de-dados"
+BASE_URL = os.getenv("PORTAL_API_URL", "https://api.portaldatransparencia.gov.br/api-de-dados")
 API_KEY = os.getenv("API_KEY")
 
 HEADERS = {
@@ -21,220 +32,501 @@ HEADERS = {
     "chave-api-dados": API_KEY
 }
 
-def get_endpoint_by_date(mes_ano_str):
-    """
-    Retorna o endpoint correto baseado na data de referência:
-    - Até 10/2021: Bolsa Família
-    - 11/2021 a 02/2023: Auxílio Brasil
-    - 03/2023 em diante: Novo Bolsa Família
-    """
-    try:
-        data = datetime.strptime(mes_ano_str, "%Y%m")
-        if data < datetime(2021, 11, 1):
-            return "/bolsa-familia-por-municipio"
-        elif data < datetime(2023, 3, 1):
-            return "/auxilio-brasil-por-municipio"
-        else:
-            return "/novo-bolsa-familia-por-municipio"
-    except Exception as e:
-        logging.error(f"Erro ao parsear data {mes_ano_str}: {e}")
-        return "/novo-bolsa-familia-por-municipio"
+# Shared quota for every thread hitting the API (requests per minute, day / night)
+QUOTA = QuotaProfile.from_env()
+DEFAULT_WORKERS = 8
+# 429s tolerated per page; the limiter handles the backoff between them
+MAX_THROTTLED = int(os.getenv("ETL_MAX_THROTTLED", "8"))
+# Transient failures (timeouts, bad JSON, exhausted HTTP retries) per page
+FETCH_RETRIES = int(os.getenv("ETL_FETCH_RETRIES", "3"))
+FETCH_RETRY_DELAY = 5
+# Runaway guard only; reaching it fails the job instead of completing it
+MAX_PAGES = int(os.getenv("ETL_MAX_PAGES", "20000"))
+IBGE_MUNICIPIOS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+
+rate_limiter = AdaptiveLimiter(QUOTA, capacity=3)
 
 def get_session():
-    """Create a requests session with retry logic"""
+    """
+    Create a requests session with retry logic. 429 is left to the shared
+    rate limiter so every worker slows down, not just the one throttled.
+    """
     session = requests.Session()
-    retries = Retry(total=5, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504])
+    retries = Retry(total=5, backoff_factor=2, status_forcelist=[500, 502, 503, 504])
     session.mount('https://', HTTPAdapter(max_retries=retries))
     return session
 
 def fetch_data(session, endpoint, mes_ano, codigo_ibge, pagina=1):
-    """Fetches data from the API with pagination and rate limiting."""
+    """
+    Fetches one page from the API with rate limiting. Returns the decoded
+    page ([] when past the end) or None on error. `codigo_ibge=NATIONAL`
+    lists every municipality.
+    """
     url = f"{BASE_URL}{endpoint}"
     params = {
         "mesAno": mes_ano,
-        "codigoIbge": codigo_ibge,
         "pagina": pagina
     }
+    if codigo_ibge != NATIONAL:
+        params["codigoIbge"] = codigo_ibge
     
     try:
         logging.info(f"Fetching page {pagina} from {endpoint} for {mes_ano}/{codigo_ibge}...")
-        response = session.get(url, headers=HEADERS, params=params, timeout=30)
-        
-        if response.status_code == 429:
-             logging.warning("Rate limit hit. Waiting 10s...")
-             time.sleep(10)
-             return fetch_data(session, endpoint, mes_ano, codigo_ibge, pagina)
-             
-        response.raise_for_status()
-        time.sleep(1.5) # Rate limiting: 1.5s pause as per docs safety
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        for _ in range(MAX_THROTTLED):
+            metrics.inc("rate_limit_wait_seconds_total", rate_limiter.acquire(), client="etl")
+            with metrics.timer("http_request_seconds", client="etl", endpoint=endpoint):
+                response = session.get(url, headers=HEADERS, params=params, timeout=30)
+            pause = rate_limiter.observe(response.status_code, response.headers)
+            metrics.inc("http_responses_total", client="etl", status=response.status_code)
+
+            if response.status_code == 429:
+                metrics.inc("http_throttled_total", client="etl")
+                logging.warning(f"Rate limit hit. Backing off {pause:.0f}s "
+                                f"(now {rate_limiter.rate * 60:.0f} req/min)...")
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+        logging.error(f"Still throttled after {MAX_THROTTLED} attempts: page {pagina} of {mes_ano}/{codigo_ibge}")
+        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        metrics.inc("http_responses_total", client="etl", status="error")
         logging.error(f"API Request failed: {e}")
         if 'response' in locals() and response:
             logging.error(f"Response content: {response.text[:200]}")
         return None
 
-def save_raw_data(data, mes_ano, codigo_ibge, pagina):
+@metrics.timed("stage_seconds", stage="save_raw")
+def save_raw_data(data, mes_ano, codigo_ibge, pagina, endpoint=None):
     """
-    Saves the full JSON response to Postgres raw_bolsa_familia table.
+    Saves the JSON response to Postgres raw_bolsa_familia table (compacted
+    per RAW_STORAGE, see src/etl/raw_storage.py). A re-fetch replaces the
+    stored page only when its content hash changed.
+    When `endpoint` is given, the job checkpoint advances in the same transaction.
+    Errors are logged and re-raised so the pipeline can dead-letter the page.
     """
-    conn = get_connection()
-    if not conn:
-        return
-
     try:
-        cur = conn.cursor()
-        query = """
-            INSERT INTO raw_bolsa_familia 
-            (reference_date, municipality_code, page_number, api_response)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (reference_date, municipality_code, page_number) 
-            DO NOTHING
-        """
-        date_obj = datetime.strptime(mes_ano, "%Y%m").date()
-        
-        # Se data for uma lista (muitos beneficiários por página) ou um objeto único
-        cur.execute(query, (date_obj, codigo_ibge, pagina, json.dumps(data)))
-        rows_affected = cur.rowcount
-        conn.commit()
-        
-        if rows_affected > 0:
-            logging.info(f"✅ Saved page {pagina} ({len(data) if isinstance(data, list) else 1} records).")
-        else:
-            logging.info(f"⚠️ Page {pagina} already exists. Skipped RAW insert.")
+        with connection() as conn:
+            cur = conn.cursor()
+            date_obj = datetime.strptime(mes_ano, "%Y%m").date()
+            rows_affected, new_refs = upsert_page(cur, data, date_obj, codigo_ibge, pagina)
+            if endpoint:
+                record_page(cur, endpoint, mes_ano, codigo_ibge, pagina,
+                            len(data) if isinstance(data, list) else 1)
+            with metrics.timer("db_commit_seconds", op="save_raw"):
+                conn.commit()
+            remember_refs(new_refs)
+            metrics.inc("raw_pages_total", result="saved" if rows_affected > 0 else "unchanged")
             
-        cur.close()
+            if rows_affected > 0:
+                logging.info(f"✅ Saved page {pagina} ({len(data) if isinstance(data, list) else 1} records).")
+            else:
+                logging.info(f"⚠️ Page {pagina} unchanged since last fetch. Skipped RAW write.")
+                
+            cur.close()
     except Exception as e:
         logging.error(f"Database insertion failed: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        raise
 
+def _star_schema_rows(items):
+    """
+    Flattens API items into deduplicated dim/fact rows. Later items win, just
+    like the row-by-row upserts did.
+    """
+    municipios = {}
+    programas = {}
+    fatos = {}
+    
+    for item in items:
+        mun = item.get("municipio", {})
+        uf = mun.get("uf", {})
+        prog = item.get("tipo", {})
+        
+        municipios[mun.get("codigoIBGE")] = (
+            mun.get("codigoIBGE"),
+            mun.get("nomeIBGE"),
+            uf.get("sigla"),
+            mun.get("nomeRegiao"),
+            mun.get("pais")
+        )
+        programas[prog.get("id")] = (
+            prog.get("id"),
+            prog.get("descricao"),
+            prog.get("descricaoDetalhada")
+        )
+        fatos[(item.get("dataReferencia"), mun.get("codigoIBGE"), prog.get("id"))] = (
+            item.get("dataReferencia"),
+            mun.get("codigoIBGE"),
+            prog.get("id"),
+            item.get("valor"),
+            item.get("quantidadeBeneficiados")
+        )
+
+    return list(municipios.values()), list(programas.values()), list(fatos.values())
+
+def load_star_schema(cur, items):
+    """
+    Upserts a batch of items with one multi-row statement per table
+    (3 round trips per batch instead of 3 per item). Returns the fact row count.
+    """
+    municipios, programas, fatos = _star_schema_rows(items)
+    if not fatos:
+        return 0
+
+    # 1. Upsert Dimension: Municipio
+    execute_values(cur, """
+        INSERT INTO dim_municipio (codigo_ibge, nome_ibge, uf_sigla, nome_regiao, pais)
+        VALUES %s
+        ON CONFLICT (codigo_ibge) DO UPDATE SET
+            nome_ibge = EXCLUDED.nome_ibge,
+            uf_sigla = EXCLUDED.uf_sigla,
+            nome_regiao = EXCLUDED.nome_regiao;
+    """, municipios, page_size=len(municipios))
+
+    # 2. Upsert Dimension: Programa
+    execute_values(cur, """
+        INSERT INTO dim_programa (id, descricao, descricao_detalhada)
+        VALUES %s
+        ON CONFLICT (id) DO UPDATE SET
+            descricao = EXCLUDED.descricao,
+            descricao_detalhada = EXCLUDED.descricao_detalhada;
+    """, programas, page_size=len(programas))
+
+    # 3. Insert Fact: Pagamentos
+    execute_values(cur, """
+        INSERT INTO fact_pagamentos_municipio 
+        (data_referencia, codigo_ibge, programa_id, valor_total, quantidade_beneficiados)
+        VALUES %s
+        ON CONFLICT (data_referencia, codigo_ibge, programa_id) DO UPDATE SET
+            valor_total = EXCLUDED.valor_total,
+            quantidade_beneficiados = EXCLUDED.quantidade_beneficiados;
+    """, fatos, page_size=len(fatos))
+
+    return len(fatos)
+
+@metrics.timed("stage_seconds", stage="process_and_load")
 def process_and_load(data):
     """
     Parses the JSON data and loads it into the relational Star Schema.
+    Errors are logged and re-raised so the pipeline can dead-letter the page.
     """
-    conn = get_connection()
-    if not conn:
-        return
-
     try:
-        cur = conn.cursor()
-        
-        # Ensure data is a list
-        items = data if isinstance(data, list) else [data]
-        
-        for item in items:
-            # 1. Upsert Dimension: Municipio
-            mun = item.get("municipio", {})
-            uf = mun.get("uf", {})
-            cur.execute("""
-                INSERT INTO dim_municipio (codigo_ibge, nome_ibge, uf_sigla, nome_regiao, pais)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (codigo_ibge) DO UPDATE SET
-                    nome_ibge = EXCLUDED.nome_ibge,
-                    uf_sigla = EXCLUDED.uf_sigla,
-                    nome_regiao = EXCLUDED.nome_regiao;
-            """, (
-                mun.get("codigoIBGE"),
-                mun.get("nomeIBGE"),
-                uf.get("sigla"),
-                mun.get("nomeRegiao"),
-                mun.get("pais")
-            ))
-
-            # 2. Upsert Dimension: Programa
-            prog = item.get("tipo", {})
-            cur.execute("""
-                INSERT INTO dim_programa (id, descricao, descricao_detalhada)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    descricao = EXCLUDED.descricao,
-                    descricao_detalhada = EXCLUDED.descricao_detalhada;
-            """, (
-                prog.get("id"),
-                prog.get("descricao"),
-                prog.get("descricaoDetalhada")
-            ))
-
-            # 3. Insert Fact: Pagamentos
-            cur.execute("""
-                INSERT INTO fact_pagamentos_municipio 
-                (data_referencia, codigo_ibge, programa_id, valor_total, quantidade_beneficiados)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (data_referencia, codigo_ibge, programa_id) DO UPDATE SET
-                    valor_total = EXCLUDED.valor_total,
-                    quantidade_beneficiados = EXCLUDED.quantidade_beneficiados;
-            """, (
-                item.get("dataReferencia"),
-                mun.get("codigoIBGE"),
-                prog.get("id"),
-                item.get("valor"),
-                item.get("quantidadeBeneficiados")
-            ))
+        with connection() as conn:
+            cur = conn.cursor()
             
-        conn.commit()
-        logging.info(f"🔄 Processed {len(items)} records into Relational Schema.")
-        cur.close()
+            # Ensure data is a list
+            items = data if isinstance(data, list) else [data]
+            load_star_schema(cur, items)
+                
+            with metrics.timer("db_commit_seconds", op="process_and_load"):
+                conn.commit()
+            metrics.inc("rows_loaded_total", len(items))
+            logging.info(f"🔄 Processed {len(items)} records into Relational Schema.")
+            cur.close()
     except Exception as e:
         logging.error(f"Relational processing failed: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+        raise
 
 import argparse
 
-def run_month(mes_ano, codigo_ibge):
-    logging.info(f"🚀 Starting processing for {mes_ano}...")
-    
-    # Ensure DB schema is up to date
-    init_db()
+class ThroughputMeter:
+    """Thread-safe progress counters for the concurrent extraction mode."""
 
-    endpoint = get_endpoint_by_date(mes_ano)
-    session = get_session()
+    def __init__(self, total_jobs, report_every=30):
+        self.total_jobs = total_jobs
+        self.report_every = report_every
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.requests = 0
+        self.records = 0
+        self.stages = {}
+        self.started_at = time.monotonic()
+        self._last_report = self.started_at
+        self._lock = threading.Lock()
+
+    def record_request(self, records):
+        with self._lock:
+            self.requests += 1
+            self.records += records
+        self.maybe_report()
+
+    def record_job(self, ok=True):
+        with self._lock:
+            self.jobs_done += 1
+            if not ok:
+                self.jobs_failed += 1
+        self.maybe_report()
+
+    def maybe_report(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.report_every:
+                return
+            self._last_report = now
+        self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        logging.info(
+            f"📈 Jobs {self.jobs_done}/{self.total_jobs} ({self.jobs_failed} failed) | "
+            f"{self.requests} requests ({self.requests / elapsed:.2f} req/s) | "
+            f"{self.records} records ({self.records / elapsed:.1f} rec/s)"
+        )
+
+def fetch_page(session, endpoint, mes_ano, codigo_ibge, pagina):
+    """fetch_data with a few spaced retries, so a transient error doesn't end the job."""
+    for attempt in range(1, FETCH_RETRIES + 1):
+        data = fetch_data(session, endpoint, mes_ano, codigo_ibge, pagina)
+        if data is not None:
+            return data
+        if attempt < FETCH_RETRIES:
+            logging.warning(f"Retrying page {pagina} of {mes_ano}/{codigo_ibge} ({attempt}/{FETCH_RETRIES})...")
+            metrics.inc("retry_sleep_seconds_total", FETCH_RETRY_DELAY * attempt, client="etl")
+            time.sleep(FETCH_RETRY_DELAY * attempt)
+    return None
+
+# extract_month outcomes besides STATUS_COMPLETED / STATUS_FAILED
+JOB_SKIPPED = "skipped"
+JOB_INTERRUPTED = "interrupted"
+
+def new_pipeline(fetchers=1):
+    return PagePipeline(save_raw_data, process_and_load, fetchers=fetchers).start()
+
+def extract_month(session, endpoint, mes_ano, codigo_ibge, pipeline, meter=None, force=False, stop=None):
+    """
+    Walks every page of a single (month, municipality) job, resuming from
+    its checkpoint, and hands each page to the pipeline's raw writer. The
+    job is marked completed/failed by the writer once its pages are saved.
+    Completed jobs are skipped unless `force` is set.
+
+    A short page (below the endpoint's learned page size) is the last one;
+    until the size is known, listing stops at the first empty page. A page
+    that still fails after retries fails the job, and the next run resumes
+    from the checkpoint.
+
+    Setting the `stop` event (a shutting-down worker) leaves the job
+    unfinished at its checkpoint, to be resumed by whoever claims it next.
+
+    Returns STATUS_COMPLETED (every page handed to the writer),
+    STATUS_FAILED, JOB_INTERRUPTED or JOB_SKIPPED.
+    """
+    job = (endpoint, mes_ano, codigo_ibge)
     page = 1
+    if not force:
+        state = get_job_state(endpoint, mes_ano, codigo_ibge)
+        if state and state["status"] == STATUS_COMPLETED:
+            logging.info(f"⏭️ {mes_ano}/{codigo_ibge} already completed. Skipping.")
+            return JOB_SKIPPED
+        if state and state["last_page"]:
+            page = state["last_page"] + 1
+            logging.info(f"↩️ Resuming {mes_ano}/{codigo_ibge} at page {page}.")
     
+    page_size = get_page_size(endpoint)
+    previous = None
     while True:
-        data = fetch_data(session, endpoint, mes_ano, codigo_ibge, page)
+        if stop is not None and stop.is_set():
+            logging.info(f"⏸️ Interrupted {mes_ano}/{codigo_ibge} before page {page}.")
+            return JOB_INTERRUPTED
+        if pipeline.job_failed(job):
+            logging.info(f"🛑 Stopped {mes_ano}/{codigo_ibge} at page {page}: an earlier page failed to load. Rerun to resume.")
+            pipeline.finish_job(job)
+            return STATUS_FAILED
+        started = time.perf_counter()
+        data = fetch_page(session, endpoint, mes_ano, codigo_ibge, page)
+        if meter:
+            meter.record_request(len(data) if isinstance(data, list) else int(bool(data)))
         
+        if data is None:
+            logging.info(f"🛑 Stopped {mes_ano}/{codigo_ibge} at page {page} after an error. Rerun to resume.")
+            pipeline.fetch_failed(job, page, "fetch_data returned no response")
+            return STATUS_FAILED
+        pipeline.record_fetch(time.perf_counter() - started)
+
         if not data:
-            logging.info(f"🏁 Finished {mes_ano}. End of data or error.")
+            logging.info(f"🏁 Finished {mes_ano}/{codigo_ibge}. End of data.")
             break
+
+        # A non-empty page after a full one confirms the page size; a bigger page raises it
+        if isinstance(data, list):
+            if previous and previous != stored_page_size(endpoint):
+                learn_page_size(endpoint, previous)
+            elif page_size and len(data) > page_size:
+                learn_page_size(endpoint, len(data))
+            page_size = get_page_size(endpoint)
             
-        # 1. Load Raw (Bronze)
-        save_raw_data(data, mes_ano, codigo_ibge, page)
+        # 1. Raw (Bronze) and 2. Relational (Silver/Gold) run in the pipeline stages
+        pipeline.submit_page(job, page, data)
         
-        # 2. Process to Relational (Silver/Gold)
-        process_and_load(data)
-        
-        # Pagination check
-        if isinstance(data, list) and len(data) == 0:
+        if is_last_page(data, page_size):
+            logging.info(f"🏁 Finished {mes_ano}/{codigo_ibge} at page {page}.")
             break
-            
-        if not isinstance(data, list) or len(data) < 10: 
-             break
 
+        previous = len(data)
         page += 1
-        if page > 500: # Safety cap
-            logging.warning("Safety limit reached (500 pages).")
-            break
+        if page > MAX_PAGES:
+            logging.error(f"🛑 {mes_ano}/{codigo_ibge} passed {MAX_PAGES} pages. Check ETL_MAX_PAGES.")
+            pipeline.fetch_failed(job, page, f"page limit {MAX_PAGES} reached")
+            return STATUS_FAILED
+
+    pipeline.finish_job(job)
+    return STATUS_COMPLETED
+
+def run_month(mes_ano, codigo_ibge, force=False):
+    logging.info(f"🚀 Starting processing for {mes_ano}...")
+    
+    # Ensure DB schema is up to date
+    init_db()
+    prepare_partitions([mes_ano])
+
+    endpoint = get_endpoint_by_date(mes_ano)
+    pipeline = new_pipeline()
+    try:
+        extract_month(get_session(), endpoint, mes_ano, codigo_ibge, pipeline, force=force)
+    finally:
+        pipeline.close()
+    pipeline.report()
+    refresh_months([datetime.strptime(mes_ano, "%Y%m").date()])
+
+def run_concurrent(months, codigos_ibge, workers=DEFAULT_WORKERS, force=False, mode="municipal"):
+    """
+    Runs the planned jobs (see src/etl/planner.py) on a thread pool. Pacing
+    is left to the shared adaptive `rate_limiter`, so the workers together
+    use the whole quota and back off together on 429s.
+    The workers are the fetch stage of a single pipeline; raw inserts and
+    the relational load run behind it.
+    """
+    init_db()
+    prepare_partitions(months)
+
+    work_plan = plan(months, codigos_ibge, mode=mode, force=force)
+    jobs = work_plan.jobs
+    if work_plan.skipped:
+        logging.info(f"⏭️ Skipping {work_plan.skipped} completed jobs.")
+    meter = ThroughputMeter(total_jobs=len(jobs))
+    pipeline = new_pipeline(fetchers=workers)
+    sessions = threading.local()
+    logging.info(f"🚀 Starting {len(jobs)} jobs with {workers} workers "
+                 f"at {rate_limiter.rate * 60:.0f} req/min...")
+
+    def work(endpoint, mes_ano, codigo_ibge):
+        if not hasattr(sessions, "session"):
+            sessions.session = get_session()
+        return extract_month(sessions.session, endpoint, mes_ano, codigo_ibge, pipeline, meter, force)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl-fetch") as pool:
+            futures = {pool.submit(work, *job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    meter.record_job(ok=future.result() != STATUS_FAILED)
+                except Exception as e:
+                    _, mes_ano, codigo = futures[future]
+                    logging.error(f"Job {mes_ano}/{codigo} failed: {e}")
+                    meter.record_job(ok=False)
+    finally:
+        pipeline.close()
+
+    meter.report()
+    pipeline.report()
+    meter.stages = pipeline.snapshot()
+    refresh_months([datetime.strptime(m, "%Y%m").date() for m in months])
+    return meter
+
+def load_ibge_file(path):
+    """Reads IBGE codes from a text/CSV file (first column, '#' for comments)."""
+    codigos = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            codigo = line.split(",")[0].split(";")[0].strip()
+            if codigo.isdigit():
+                codigos.append(codigo)
+    return list(dict.fromkeys(codigos))
+
+def load_all_municipalities():
+    """
+    Lists every municipality code from the IBGE localidades API, falling back
+    to the ones already known in dim_municipio.
+    """
+    try:
+        response = get_session().get(IBGE_MUNICIPIOS_URL, timeout=60)
+        response.raise_for_status()
+        return [str(m["id"]) for m in response.json()]
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"IBGE API unavailable ({e}). Using dim_municipio instead.")
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT codigo_ibge FROM dim_municipio ORDER BY codigo_ibge;")
+        return [row[0] for row in cur.fetchall()]
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Portal Transparencia ETL')
     parser.add_argument('--year', type=int, help='Process entire year (YYYY)')
     parser.add_argument('--month', type=str, help='Process specific month (YYYYMM)')
+    parser.add_argument('--from', dest='from_month', type=str, help='First month of a range (YYYYMM), across program eras')
+    parser.add_argument('--to', dest='to_month', type=str, help='Last month of the range (YYYYMM, default: last month)')
     parser.add_argument('--ibge', type=str, default="3550308", help='IBGE Code (default: SP)')
+    parser.add_argument('--all-municipalities', action='store_true', help='Process every Brazilian municipality')
+    parser.add_argument('--ibge-file', type=str, help='File with one IBGE code per line')
+    parser.add_argument('--national', action='store_true', help='Use the national listing (no codigoIbge filter, one job per month)')
+    parser.add_argument('--mode', choices=MODES, default='auto', help='Multi-job modes: per-municipality jobs, national listing, or whichever takes fewer requests per month (default)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the plan (jobs, API requests, estimated time) and exit')
+    parser.add_argument('--workers', type=int, help=f'Concurrent workers (default: {DEFAULT_WORKERS} in multi-job modes)')
+    parser.add_argument('--rate', type=float, help=f'Fixed API quota in requests/min (default: {QUOTA.day * 60:.0f} by day, {QUOTA.night * 60:.0f} at night)')
+    parser.add_argument('--force', action='store_true', help='Ignore checkpoints and re-fetch completed jobs')
+    parser.add_argument('--replay-dead-letters', action='store_true', help='Retry pages parked in etl_dead_letter and exit')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port (/metrics, /metrics.json)')
+    parser.add_argument('--metrics-file', type=str, help='Write a JSON metrics snapshot to this file (periodically and at exit)')
+    parser.add_argument('--profile', type=str, metavar='FILE', help='Profile the run with cProfile and write stats to FILE')
     
     args = parser.parse_args()
-    
-    if args.year:
-        logging.info(f"📅 Batch processing for Year {args.year}")
-        for m in range(1, 13):
-            mes_ano = f"{args.year}{m:02d}"
-            run_month(mes_ano, args.ibge)
-            time.sleep(2) # Cooldown between months
-    elif args.month:
-        run_month(args.month, args.ibge)
-    else:
-        # Default behavior (Test)
-        run_month("202401", args.ibge)
+    metrics.start_exporter(port=args.metrics_port, path=args.metrics_file)
+
+    if args.replay_dead_letters:
+        init_db()
+        replay_dead_letters(save_raw_data, process_and_load)
+        raise SystemExit(0)
+
+    with metrics.profiling(args.profile):
+        if args.rate:
+            rate_limiter.set_rate(args.rate / 60.0)
+
+        if args.from_month:
+            last_month = (datetime.now().replace(day=1) - timedelta(days=1)).strftime("%Y%m")
+            months = month_range(args.from_month, args.to_month or last_month)
+        elif args.year:
+            months = [f"{args.year}{m:02d}" for m in range(1, 13)]
+        elif args.month:
+            months = [args.month]
+        else:
+            # Default behavior (Test)
+            months = ["202401"]
+
+        concurrent = args.all_municipalities or args.ibge_file or args.national or (args.workers or 1) > 1
+        if args.national:
+            codigos = [NATIONAL]
+        elif args.all_municipalities:
+            codigos = load_all_municipalities()
+        elif args.ibge_file:
+            codigos = load_ibge_file(args.ibge_file)
+        else:
+            codigos = [args.ibge]
+        mode = args.mode if concurrent else "municipal"
+
+        if args.dry_run:
+            init_db()
+            print_plan(plan(months, codigos, mode=mode, force=args.force), QUOTA,
+                       fixed_rate=args.rate / 60.0 if args.rate else None)
+        elif concurrent:
+            logging.info(f"📅 Concurrent processing: {len(months)} month(s) x {len(codigos)} municipalities")
+            run_concurrent(months, codigos, workers=args.workers or DEFAULT_WORKERS,
+                           force=args.force, mode=mode)
+        else:
+            if args.year:
+                logging.info(f"📅 Batch processing for Year {args.year}")
+            for mes_ano in months:
+                run_month(mes_ano, args.ibge, force=args.force)
@@ -0,0 +1,206 @@
+"""
+Checkpoints for (endpoint, mes_ano, codigo_ibge) extraction jobs, so reruns
+skip completed work and crashed jobs resume from the last saved page.
+
+The same table is the work queue shared by ETL workers (src/etl/worker.py):
+pending/failed jobs, and running jobs whose lease expired, are claimed with
+FOR UPDATE SKIP LOCKED.
+"""
+from datetime import datetime
+from psycopg2.extras import execute_values
+from src.db.connection import connection
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+def get_job_state(endpoint, mes_ano, codigo_ibge):
+    """
+    Returns the checkpoint for a job as a dict, or None if it never ran.
+    Jobs loaded before checkpoints existed are seeded from raw_bolsa_familia.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT last_page, status, pages_loaded, rows_loaded
+            FROM etl_job_state
+            WHERE endpoint = %s AND mes_ano = %s AND codigo_ibge = %s;
+        """, (endpoint, mes_ano, codigo_ibge))
+        row = cur.fetchone()
+        if row:
+            return {"last_page": row[0], "status": row[1], "pages_loaded": row[2], "rows_loaded": row[3]}
+
+        cur.execute("""
+            SELECT MAX(page_number), COUNT(*)
+            FROM raw_bolsa_familia
+            WHERE reference_date = %s AND municipality_code = %s;
+        """, (datetime.strptime(mes_ano, "%Y%m").date(), codigo_ibge))
+        last_page, pages = cur.fetchone()
+        if not last_page:
+            return None
+        return {"last_page": last_page, "status": STATUS_RUNNING, "pages_loaded": pages, "rows_loaded": 0}
+
+def record_page(cur, endpoint, mes_ano, codigo_ibge, page, rows):
+    """
+    Advances the checkpoint. Runs on the caller's cursor/transaction.
+    Page 1 starts the job over (a --force rerun), so counters restart with
+    it; a page at or below the checkpoint (a replayed page) is not counted
+    twice. pages_loaded always equals last_page.
+    """
+    cur.execute("""
+        INSERT INTO etl_job_state
+        (endpoint, mes_ano, codigo_ibge, last_page, status, pages_loaded, rows_loaded)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (endpoint, mes_ano, codigo_ibge) DO UPDATE SET
+            last_page = CASE WHEN EXCLUDED.last_page = 1 THEN 1
+                             ELSE GREATEST(etl_job_state.last_page, EXCLUDED.last_page) END,
+            status = EXCLUDED.status,
+            pages_loaded = CASE WHEN EXCLUDED.last_page = 1 THEN 1
+                                ELSE GREATEST(etl_job_state.last_page, EXCLUDED.last_page) END,
+            rows_loaded = CASE
+                WHEN EXCLUDED.last_page = 1 THEN EXCLUDED.rows_loaded
+                WHEN EXCLUDED.last_page > COALESCE(etl_job_state.last_page, 0)
+                    THEN etl_job_state.rows_loaded + EXCLUDED.rows_loaded
+                ELSE etl_job_state.rows_loaded END,
+            updated_at = NOW();
+    """, (endpoint, mes_ano, codigo_ibge, page, STATUS_RUNNING, page, rows))
+
+def rewind_job(endpoint, mes_ano, codigo_ibge, page):
+    """
+    Moves the checkpoint back to just before `page` (a page that failed to
+    save or load), so the next attempt re-fetches it and everything after.
+    rows_loaded is recounted from the raw pages kept.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE etl_job_state SET
+                last_page = LEAST(COALESCE(last_page, 0), %(kept)s),
+                pages_loaded = LEAST(COALESCE(last_page, 0), %(kept)s),
+                rows_loaded = (
+                    SELECT COALESCE(SUM(CASE WHEN jsonb_typeof(api_response) = 'array'
+                                             THEN jsonb_array_length(api_response) ELSE 1 END), 0)
+                    FROM raw_bolsa_familia
+                    WHERE reference_date = %(reference_date)s AND municipality_code = %(codigo)s
+                      AND page_number <= %(kept)s
+                ),
+                updated_at = NOW()
+            WHERE endpoint = %(endpoint)s AND mes_ano = %(mes_ano)s AND codigo_ibge = %(codigo)s;
+        """, {"kept": page - 1, "reference_date": datetime.strptime(mes_ano, "%Y%m").date(),
+              "endpoint": endpoint, "mes_ano": mes_ano, "codigo": codigo_ibge})
+        conn.commit()
+
+def mark_job(endpoint, mes_ano, codigo_ibge, status):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO etl_job_state (endpoint, mes_ano, codigo_ibge, status)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (endpoint, mes_ano, codigo_ibge) DO UPDATE SET
+                status = EXCLUDED.status,
+                updated_at = NOW();
+        """, (endpoint, mes_ano, codigo_ibge, status))
+        conn.commit()
+
+def completed_jobs(months):
+    """Set of (endpoint, mes_ano, codigo_ibge) already completed for `months`."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT endpoint, mes_ano, codigo_ibge
+            FROM etl_job_state
+            WHERE status = %s AND mes_ano = ANY(%s);
+        """, (STATUS_COMPLETED, list(months)))
+        return set(cur.fetchall())
+
+def enqueue_jobs(jobs, retry_failed=False):
+    """
+    Queues (endpoint, mes_ano, codigo_ibge) jobs; existing ones are left as
+    they are, except failed ones when `retry_failed` is set: those go back to
+    pending with attempts reset, so jobs past max_attempts can run again.
+    Returns the number added (or re-queued).
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return 0
+    on_conflict = f"""DO UPDATE SET
+                status = EXCLUDED.status,
+                attempts = 0,
+                claimed_by = NULL,
+                updated_at = NOW()
+            WHERE etl_job_state.status = '{STATUS_FAILED}'""" if retry_failed else "DO NOTHING"
+    with connection() as conn:
+        cur = conn.cursor()
+        added = execute_values(cur, f"""
+            INSERT INTO etl_job_state (endpoint, mes_ano, codigo_ibge, status)
+            VALUES %s
+            ON CONFLICT (endpoint, mes_ano, codigo_ibge) {on_conflict}
+            RETURNING 1;
+        """, [(e, m, c, STATUS_PENDING) for e, m, c in jobs], page_size=1000, fetch=True)
+        conn.commit()
+    # RETURNING, since rowcount only covers execute_values' last page
+    return len(added)
+
+def claim_jobs(worker_id, limit=1, lease_seconds=300, max_attempts=5):
+    """
+    Claims up to `limit` jobs for `worker_id`: pending ones first, then
+    failed ones below `max_attempts`, then running ones whose heartbeat is
+    older than the lease (their worker died). Returns [(endpoint, mes_ano, codigo_ibge)].
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE etl_job_state j SET
+                status = %(running)s,
+                claimed_by = %(worker)s,
+                heartbeat_at = NOW(),
+                attempts = j.attempts + 1,
+                updated_at = NOW()
+            FROM (
+                SELECT endpoint, mes_ano, codigo_ibge
+                FROM etl_job_state
+                WHERE status = %(pending)s
+                   OR (status = %(failed)s AND attempts < %(max_attempts)s)
+                   OR (status = %(running)s
+                       AND COALESCE(heartbeat_at, updated_at) < NOW() - make_interval(secs => %(lease)s))
+                ORDER BY status = %(pending)s DESC, mes_ano, codigo_ibge
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            ) c
+            WHERE (j.endpoint, j.mes_ano, j.codigo_ibge) = (c.endpoint, c.mes_ano, c.codigo_ibge)
+            RETURNING j.endpoint, j.mes_ano, j.codigo_ibge;
+        """, {"running": STATUS_RUNNING, "pending": STATUS_PENDING, "failed": STATUS_FAILED,
+              "worker": worker_id, "max_attempts": max_attempts, "lease": lease_seconds, "limit": limit})
+        claimed = cur.fetchall()
+        conn.commit()
+    return claimed
+
+def heartbeat_jobs(worker_id):
+    """Extends the lease of every job `worker_id` is still running."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE etl_job_state SET heartbeat_at = NOW()
+            WHERE claimed_by = %s AND status = %s;
+        """, (worker_id, STATUS_RUNNING))
+        conn.commit()
+
+def release_jobs(worker_id):
+    """Puts `worker_id`'s running jobs back in the queue (they resume from their checkpoint)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE etl_job_state SET status = %s, claimed_by = NULL, attempts = GREATEST(attempts - 1, 0)
+            WHERE claimed_by = %s AND status = %s;
+        """, (STATUS_PENDING, worker_id, STATUS_RUNNING))
+        released = cur.rowcount
+        conn.commit()
+    return released
+
+def queue_status():
+    """{status: job count} over the whole queue."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT status, COUNT(*) FROM etl_job_state GROUP BY status;")
+        return dict(cur.fetchall())
@@ -0,0 +1,70 @@
+"""
+Page-size contract per API endpoint. The Portal returns fixed-size pages,
+so a short page is the last one; sizes are learned from observed pages and
+stored in etl_page_size so later runs skip the trailing empty-page probe.
+"""
+import logging
+import os
+import threading
+from src.db.connection import connection
+
+# Pseudo municipality code for national listings (no codigoIbge filter)
+NATIONAL = "BR"
+
+# Page size to assume until an endpoint's size is confirmed and stored.
+# 0 (default) means "unknown": pages are read until the first empty one, so
+# an endpoint with smaller pages is never cut short by a wrong guess.
+DEFAULT_PAGE_SIZE = int(os.getenv("PORTAL_PAGE_SIZE", "0"))
+
+_sizes = {}
+_lock = threading.Lock()
+
+def stored_page_size(endpoint):
+    """Page size confirmed for `endpoint`, or None if never observed."""
+    with _lock:
+        if endpoint in _sizes:
+            return _sizes[endpoint]
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT page_size FROM etl_page_size WHERE endpoint = %s;", (endpoint,))
+        row = cur.fetchone()
+    with _lock:
+        _sizes.setdefault(endpoint, row[0] if row else None)
+        return _sizes[endpoint]
+
+def get_page_size(endpoint):
+    """Page size to assume for `endpoint`, or None when it is unknown."""
+    return stored_page_size(endpoint) or DEFAULT_PAGE_SIZE or None
+
+def learn_page_size(endpoint, size):
+    """
+    Records a confirmed full-page size: a page of `size` items that was
+    followed by a non-empty page, or any page larger than the known size.
+    The stored size is replaced, not maxed, so a smaller confirmed size wins.
+    """
+    with _lock:
+        if _sizes.get(endpoint) == size:
+            return
+        _sizes[endpoint] = size
+    logging.info(f"📏 Page size for {endpoint}: {size} items.")
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO etl_page_size (endpoint, page_size)
+            VALUES (%s, %s)
+            ON CONFLICT (endpoint) DO UPDATE SET
+                page_size = EXCLUDED.page_size,
+                observed_at = NOW();
+        """, (endpoint, size))
+        conn.commit()
+
+def is_last_page(data, page_size):
+    """
+    True when `data` cannot be followed by more pages. Without a known page
+    size only an empty page ends the listing.
+    """
+    if not isinstance(data, list):
+        return True
+    if page_size is None:
+        return False
+    return len(data) < page_size
@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from src.db.connection import connection
+from src.etl.job_state import mark_job, rewind_job, STATUS_COMPLETED, STATUS_FAILED
+
+QUEUE_SIZE = int(os.getenv("ETL_QUEUE_SIZE", "16"))
+STAGES = ("fetch", "raw", "transform")
+_STOP = object()
+
+def dead_letter(stage, job, page, error, payload=None):
+    """Parks a failed page in etl_dead_letter instead of silently dropping it."""
+    endpoint, mes_ano, codigo_ibge = job
+    try:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO etl_dead_letter
+                (stage, endpoint, mes_ano, codigo_ibge, page_number, error, payload)
+                VALUES (%s, %s, %s, %s, %s, %s, %s);
+            """, (stage, endpoint, mes_ano, codigo_ibge, page, str(error)[:2000],
+                  json.dumps(payload) if payload is not None else None))
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Could not write dead letter ({stage} {mes_ano}/{codigo_ibge} p{page}): {e}")
+
+def resolve_dead_letters(job, stage="fetch"):
+    endpoint, mes_ano, codigo_ibge = job
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE etl_dead_letter SET resolved_at = NOW()
+            WHERE stage = %s AND endpoint = %s AND mes_ano = %s AND codigo_ibge = %s
+              AND resolved_at IS NULL;
+        """, (stage, endpoint, mes_ano, codigo_ibge))
+        conn.commit()
+
+class StageStats:
+    """Throughput, busy time and queue depth for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.depth_max = 0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, ok=True):
+        with self._lock:
+            self.items += 1
+            self.busy += seconds
+            if not ok:
+                self.errors += 1
+
+    def sample_depth(self, depth):
+        with self._lock:
+            self.depth_max = max(self.depth_max, depth)
+            self.depth_sum += depth
+            self.depth_samples += 1
+
+    def snapshot(self, elapsed, workers=1):
+        with self._lock:
+            return {
+                "items": self.items,
+                "errors": self.errors,
+                "per_s": round(self.items / elapsed, 2) if elapsed else 0.0,
+                "busy_pct": round(100 * self.busy / (elapsed * workers), 1) if elapsed else 0.0,
+                "queue_avg": round(self.depth_sum / self.depth_samples, 1) if self.depth_samples else 0.0,
+                "queue_max": self.depth_max,
+            }
+
+class PagePipeline:
+    """
+    fetch → raw writer → transformer, connected by bounded queues. Fetchers
+    block when the raw queue is full (backpressure); one writer and one
+    transformer thread keep each job's pages and its end marker in order.
+    The end marker reaches the transformer after the job's last page, so a
+    job is marked completed only once its facts are committed (the local
+    read in src/api/local_store.py relies on this).
+
+    A page that fails to save or load fails its job: the job's later pages
+    are dropped, its checkpoint goes back to just before the failed page,
+    and the retry re-fetches from there.
+    """
+
+    def __init__(self, save_raw, load_relational, fetchers=1, queue_size=QUEUE_SIZE):
+        self.save_raw = save_raw
+        self.load_relational = load_relational
+        self.fetchers = fetchers
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        self.transform_queue = queue.Queue(maxsize=queue_size)
+        self.stats = {stage: StageStats(stage) for stage in STAGES}
+        self.started_at = time.monotonic()
+        self._failed = {}  # job -> first page that failed to save or load
+        self._failed_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._raw_worker, name="etl-raw-writer", daemon=True),
+            threading.Thread(target=self._transform_worker, name="etl-transformer", daemon=True),
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    # --- Fetch side (called from fetcher threads) ---
+
+    def record_fetch(self, seconds, ok=True):
+        self.stats["fetch"].observe(seconds, ok)
+
+    def submit_page(self, job, page, data):
+        self.stats["raw"].sample_depth(self.raw_queue.qsize())
+        self.raw_queue.put(("page", job, page, data))
+
+    def fetch_failed(self, job, page, error):
+        self.record_fetch(0.0, ok=False)
+        dead_letter("fetch", job, page, error)
+        self.raw_queue.put(("end", job, False))
+
+    def finish_job(self, job):
+        self.raw_queue.put(("end", job, True))
+
+    def job_failed(self, job):
+        """True once a page of `job` failed to save or load; fetching more is wasted."""
+        with self._failed_lock:
+            return job in self._failed
+
+    def _page_failed(self, job, page):
+        with self._failed_lock:
+            self._failed[job] = min(page, self._failed.get(job, page))
+
+    # --- Stages ---
+
+    def _raw_worker(self):
+        while True:
+            message = self.raw_queue.get()
+            if message is _STOP:
+                self.transform_queue.put(_STOP)
+                return
+            if message[0] == "end":
+                self.transform_queue.put(message)
+                continue
+
+            _, job, page, data = message
+            if self.job_failed(job):
+                continue
+            endpoint, mes_ano, codigo_ibge = job
+            started = time.perf_counter()
+            try:
+                self.save_raw(data, mes_ano, codigo_ibge, page, endpoint=endpoint)
+                self.stats["raw"].observe(time.perf_counter() - started)
+            except Exception as e:
+                self.stats["raw"].observe(time.perf_counter() - started, ok=False)
+                self._page_failed(job, page)
+                dead_letter("raw", job, page, e, data)
+                continue
+            self.stats["transform"].sample_depth(self.transform_queue.qsize())
+            self.transform_queue.put(("page", job, page, data))
+
+    def _finish(self, job, fetched_all):
+        with self._failed_lock:
+            failed_page = self._failed.pop(job, None)
+        ok = fetched_all and failed_page is None
+        try:
+            if failed_page is not None:
+                rewind_job(*job, failed_page)
+            mark_job(*job, STATUS_COMPLETED if ok else STATUS_FAILED)
+            if ok:
+                # Pages parked by earlier attempts were re-fetched by this one
+                for stage in ("fetch", "raw", "transform"):
+                    resolve_dead_letters(job, stage)
+        except Exception as e:
+            logging.error(f"Could not update job state for {job}: {e}")
+
+    def _transform_worker(self):
+        while True:
+            message = self.transform_queue.get()
+            if message is _STOP:
+                return
+            if message[0] == "end":
+                self._finish(*message[1:])
+                continue
+
+            _, job, page, data = message
+            if self.job_failed(job):
+                continue
+            started = time.perf_counter()
+            try:
+                self.load_relational(data)
+                self.stats["transform"].observe(time.perf_counter() - started)
+            except Exception as e:
+                self.stats["transform"].observe(time.perf_counter() - started, ok=False)
+                self._page_failed(job, page)
+                dead_letter("transform", job, page, e, data)
+
+    def close(self):
+        """Drains both queues and stops the stage threads."""
+        self.raw_queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started_at
+        return {
+            stage: stats.snapshot(elapsed, self.fetchers if stage == "fetch" else 1)
+            for stage, stats in self.stats.items()
+        }
+
+    def report(self):
+        snap = self.snapshot()
+        parts = [
+            f"{stage} {s['per_s']}/s busy {s['busy_pct']}% q~{s['queue_avg']} (max {s['queue_max']}) err {s['errors']}"
+            for stage, s in snap.items()
+        ]
+        bottleneck = max(snap, key=lambda stage: snap[stage]["busy_pct"])
+        logging.info(f"🔬 Stages | {' | '.join(parts)} | bottleneck: {bottleneck}")
+
+def replay_dead_letters(save_raw, load_relational):
+    """Retries unresolved raw/transform dead letters from their stored payloads."""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, stage, endpoint, mes_ano, codigo_ibge, page_number, payload
+            FROM etl_dead_letter
+            WHERE resolved_at IS NULL AND stage IN ('raw', 'transform') AND payload IS NOT NULL
+            ORDER BY id;
+        """)
+        pending = cur.fetchall()
+
+    replayed = 0
+    for dl_id, stage, endpoint, mes_ano, codigo_ibge, page, payload in pending:
+        try:
+            if stage == "raw":
+                save_raw(payload, mes_ano, codigo_ibge, page, endpoint=endpoint)
+            load_relational(payload)
+        except Exception as e:
+            logging.error(f"Replay of dead letter {dl_id} failed: {e}")
+            continue
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE etl_dead_letter SET resolved_at = NOW() WHERE id = %s;", (dl_id,))
+            conn.commit()
+        replayed += 1
+    logging.info(f"♻️ Replayed {replayed}/{len(pending)} dead letters.")
+    return replayed
@@ -0,0 +1,164 @@
+"""
+Plans an extraction over a month range: expands it into (endpoint, mes_ano,
+codigo_ibge) jobs across the program eras, drops what is already loaded,
+picks the cheaper of per-municipality or national listing for each month,
+and orders the work. `estimate_seconds` turns the plan's request count into
+wall time under the quota profile (see --dry-run in extract_bolsa_familia.py).
+"""
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from src.api.endpoints import get_endpoint_by_date, month_range, program_name
+from src.api.rate_limit import BRASILIA
+from src.db.connection import connection
+from src.etl.job_state import STATUS_COMPLETED, completed_jobs
+from src.etl.pagination import NATIONAL, get_page_size
+
+# Municipalities in a national listing (IBGE, 2024)
+MUNICIPIOS_BR = 5570
+# Documented Portal page size; only sizes the estimate while an endpoint's is unknown
+ESTIMATED_PAGE_SIZE = 15
+MODES = ("auto", "municipal", "national")
+
+def pages_per_job():
+    """
+    Average pages of completed jobs by (endpoint, national?), from etl_job_state.
+    Endpoints never loaded fall back to the defaults in `expected_pages`.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT endpoint, codigo_ibge = %s, AVG(pages_loaded)
+            FROM etl_job_state
+            WHERE status = %s AND pages_loaded > 0
+            GROUP BY 1, 2;
+        """, (NATIONAL, STATUS_COMPLETED))
+        return {(endpoint, national): float(avg) for endpoint, national, avg in cur.fetchall()}
+
+def expected_pages(endpoint, national, history):
+    """Requests one job is expected to take (pages, plus the empty-page probe if the size is unknown)."""
+    pages = history.get((endpoint, national))
+    page_size = get_page_size(endpoint)
+    if pages is None:
+        pages = math.ceil(MUNICIPIOS_BR / (page_size or ESTIMATED_PAGE_SIZE)) if national else 1
+    return pages + (0 if page_size else 1)
+
+def loaded_jobs(months):
+    """Completed jobs for `months`: {(endpoint, mes_ano): set of codigo_ibge (NATIONAL included)}."""
+    loaded = {}
+    for endpoint, mes_ano, codigo in completed_jobs(months):
+        loaded.setdefault((endpoint, mes_ano), set()).add(codigo)
+    return loaded
+
+class Plan:
+    """Ordered jobs plus what was skipped and the expected request count per job."""
+
+    def __init__(self, months, codigos):
+        self.months = months
+        self.codigos = codigos
+        self.jobs = []
+        self.requests = {}
+        self.skipped = 0
+
+    def add(self, endpoint, mes_ano, codigo, requests):
+        job = (endpoint, mes_ano, codigo)
+        self.jobs.append(job)
+        self.requests[job] = requests
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def by_endpoint(self):
+        """{endpoint: (months, jobs, requests)} in plan order."""
+        summary = OrderedDict()
+        for job in self.jobs:
+            months, jobs, requests = summary.get(job[0], (set(), 0, 0))
+            months.add(job[1])
+            summary[job[0]] = (months, jobs + 1, requests + self.requests[job])
+        return OrderedDict((e, (len(m), j, r)) for e, (m, j, r) in summary.items())
+
+def plan(months, codigos, mode="auto", force=False):
+    """
+    Builds the plan for `months` x `codigos`.
+    - municipal: one job per (month, municipality);
+    - national: one national listing per month;
+    - auto: per month, the national listing when it takes fewer requests
+      than the municipalities still missing (it loads all of them at once).
+    Jobs already completed (or covered by a completed national listing) are
+    skipped unless `force` is set. Work runs month by month, oldest first,
+    so each era's endpoint, page size and monthly partitions stay warm and
+    a month's jobs finish together.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if NATIONAL in codigos:
+        mode = "national"
+    codigos = [c for c in dict.fromkeys(codigos) if c != NATIONAL]
+
+    result = Plan(months, codigos)
+    history = pages_per_job()
+    loaded = {} if force else loaded_jobs(months)
+    for mes_ano in sorted(months):
+        endpoint = get_endpoint_by_date(mes_ano)
+        done = loaded.get((endpoint, mes_ano), set())
+        if NATIONAL in done:
+            result.skipped += 1 if mode == "national" else len(codigos)
+            continue
+        missing = [c for c in codigos if c not in done]
+        result.skipped += len(codigos) - len(missing)
+
+        national_cost = expected_pages(endpoint, True, history)
+        municipal_cost = expected_pages(endpoint, False, history)
+        if mode == "national" or (mode == "auto" and missing and national_cost < municipal_cost * len(missing)):
+            result.add(endpoint, mes_ano, NATIONAL, national_cost)
+        else:
+            for codigo in sorted(missing):
+                result.add(endpoint, mes_ano, codigo, municipal_cost)
+    return result
+
+def estimate_seconds(requests, profile, fixed_rate=None, start=None):
+    """
+    Wall time for `requests` at the quota (req/s), walking the day/night
+    profile minute by minute from `start` (now). Concurrency is assumed
+    high enough to keep the quota busy.
+    """
+    if fixed_rate:
+        return requests / fixed_rate
+    now = start or datetime.now(BRASILIA)
+    seconds = 0.0
+    while requests > 0:
+        per_minute = profile.rate_at(now + timedelta(seconds=seconds)) * 60
+        if requests <= per_minute:
+            return seconds + requests / per_minute * 60
+        requests -= per_minute
+        seconds += 60
+    return seconds
+
+def format_duration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours >= 24:
+        return f"{hours // 24}d {hours % 24}h{minutes:02d}m"
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{seconds:02d}s"
+
+def print_plan(result, profile, fixed_rate=None):
+    """--dry-run output: jobs and requests per program era, then the totals and ETA."""
+    months = sorted(result.months)
+    scope = f"{len(result.codigos)} municipalities" if result.codigos else "national listing"
+    print(f"Plan {months[0]} → {months[-1]}: {len(months)} month(s) x {scope}")
+    for endpoint, (n_months, jobs, requests) in result.by_endpoint().items():
+        print(f"  {program_name(endpoint):<20} {endpoint:<36} {n_months:>4} month(s) "
+              f"{jobs:>8} job(s) {requests:>9.0f} request(s)")
+    national = sum(1 for job in result.jobs if job[2] == NATIONAL)
+    if national:
+        print(f"  {national} month(s) use the national listing")
+    print(f"Already loaded: {result.skipped} job(s)")
+    eta = estimate_seconds(result.total_requests, profile, fixed_rate)
+    quota = (f"{fixed_rate * 60:.0f} req/min" if fixed_rate
+             else f"{profile.day * 60:.0f} req/min by day, {profile.night * 60:.0f} at night")
+    print(f"Total: {len(result.jobs)} job(s), ~{result.total_requests:.0f} request(s), "
+          f"~{format_duration(eta)} at {quota}")
@@ -0,0 +1,243 @@
+"""
+Compact storage for raw API pages.
+
+Every page is content-hashed so a byte-identical re-fetch is not written
+again. "full" mode (RAW_STORAGE, the default) stores the response as
+received. In opt-in "compact" mode the municipio/tipo sub-objects that
+repeat on every item are moved into raw_ref_objeto and replaced by a short
+reference ("$municipio" / "$tipo"); the transform joins them back, and
+other readers should query the raw_bolsa_familia_expanded view instead of
+api_response.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from psycopg2.extras import execute_values
+from src.db.connection import connection, init_db
+
+RAW_STORAGE = os.getenv("RAW_STORAGE", "full")
+# Item sub-objects normalized into raw_ref_objeto
+REF_FIELDS = ("municipio", "tipo")
+
+# References already committed by this process (skips the ref upsert)
+_known_refs = set()
+_known_lock = threading.Lock()
+
+def canonical(data):
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def content_hash(data):
+    return hashlib.sha256(canonical(data)).digest()
+
+def ref_key(body):
+    return hashlib.sha256(canonical(body)).hexdigest()[:16]
+
+def compact(data):
+    """
+    Returns (stored_page, refs) where `refs` maps reference -> (kind, body)
+    for every sub-object replaced in the page.
+    """
+    if not isinstance(data, list):
+        return data, {}
+    refs = {}
+    stored = []
+    for item in data:
+        if isinstance(item, dict):
+            item = dict(item)
+            for field in REF_FIELDS:
+                body = item.get(field)
+                if isinstance(body, dict):
+                    key = ref_key(body)
+                    refs[key] = (field, body)
+                    item["$" + field] = key
+                    del item[field]
+        stored.append(item)
+    return stored, refs
+
+def expand(stored, bodies):
+    """Inverse of `compact`: puts the referenced sub-objects (ref -> body) back into the page."""
+    if not isinstance(stored, list):
+        return stored
+    page = []
+    for item in stored:
+        if isinstance(item, dict):
+            item = dict(item)
+            for field in REF_FIELDS:
+                key = item.pop("$" + field, None)
+                if key is not None:
+                    item[field] = bodies.get(key)
+        page.append(item)
+    return page
+
+def prepare_page(data, mode=None):
+    """(api_response JSON, content hash, original size in bytes, refs) for a page."""
+    original = json.dumps(data)
+    if (mode or RAW_STORAGE) == "compact":
+        stored, refs = compact(data)
+        return json.dumps(stored), content_hash(data), len(original.encode("utf-8")), refs
+    return original, content_hash(data), len(original.encode("utf-8")), {}
+
+def save_refs(cur, refs):
+    """Upserts references this process has not committed yet. Returns the new keys."""
+    with _known_lock:
+        new = {k: v for k, v in refs.items() if k not in _known_refs}
+    if new:
+        execute_values(cur, """
+            INSERT INTO raw_ref_objeto (ref, kind, body) VALUES %s
+            ON CONFLICT (ref) DO NOTHING;
+        """, [(k, kind, json.dumps(body)) for k, (kind, body) in new.items()], page_size=len(new))
+    return set(new)
+
+def remember_refs(keys):
+    """Marks references as committed; call after the transaction commits."""
+    with _known_lock:
+        _known_refs.update(keys)
+
+def upsert_page(cur, data, reference_date, municipality_code, page_number):
+    """
+    Writes one page to raw_bolsa_familia on the caller's transaction. A
+    re-fetch replaces the stored page only when its content hash changed;
+    an unchanged page just gets its verified_at bumped.
+    Returns (rows written, new refs to `remember_refs` after the commit).
+    """
+    stored, digest, size, refs = prepare_page(data)
+    new_refs = save_refs(cur, refs)
+    key = (reference_date, municipality_code, page_number)
+    cur.execute("""
+        INSERT INTO raw_bolsa_familia
+        (reference_date, municipality_code, page_number, api_response, content_hash, raw_bytes)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (reference_date, municipality_code, page_number)
+        DO UPDATE SET
+            api_response = EXCLUDED.api_response,
+            content_hash = EXCLUDED.content_hash,
+            raw_bytes = EXCLUDED.raw_bytes,
+            ingested_at = NOW(),
+            verified_at = NOW()
+        WHERE raw_bolsa_familia.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    """, (*key, stored, digest, size))
+    written = cur.rowcount
+    if not written:
+        cur.execute("""
+            UPDATE raw_bolsa_familia SET verified_at = NOW()
+            WHERE reference_date = %s AND municipality_code = %s AND page_number = %s;
+        """, key)
+    return written, new_refs
+
+def load_page(cur, reference_date, municipality_code, page_number):
+    """
+    (page as the API returned it, seconds since it was last fetched) for a
+    stored page, or None.
+    """
+    cur.execute("""
+        SELECT r.api_response, EXTRACT(EPOCH FROM NOW() - COALESCE(r.verified_at, r.ingested_at)),
+               COALESCE(jsonb_object_agg(o.ref, o.body) FILTER (WHERE o.ref IS NOT NULL), '{}')
+        FROM raw_bolsa_familia r
+        LEFT JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(r.api_response) = 'array' THEN r.api_response ELSE '[]' END) AS i(item) ON TRUE
+        LEFT JOIN raw_ref_objeto o ON o.ref IN (i.item->>'$municipio', i.item->>'$tipo')
+        WHERE r.reference_date = %s AND r.municipality_code = %s AND r.page_number = %s
+        GROUP BY r.api_response, r.verified_at, r.ingested_at;
+    """, (reference_date, municipality_code, page_number))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    stored, age, bodies = row
+    return expand(stored, bodies), float(age)
+
+def compact_existing(batch=500):
+    """
+    Rewrites pages stored before hashing (content_hash IS NULL) in the
+    current mode, one committed batch at a time. ingested_at is kept, since
+    the content does not change. Returns the pages rewritten.
+    """
+    total = 0
+    while True:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT reference_date, municipality_code, page_number, api_response
+                FROM raw_bolsa_familia
+                WHERE content_hash IS NULL
+                LIMIT %s;
+            """, (batch,))
+            rows = cur.fetchall()
+            if not rows:
+                return total
+            new_refs = set()
+            for reference_date, municipality_code, page_number, data in rows:
+                stored, digest, size, refs = prepare_page(data)
+                new_refs |= save_refs(cur, refs)
+                cur.execute("""
+                    UPDATE raw_bolsa_familia
+                    SET api_response = %s, content_hash = %s, raw_bytes = %s
+                    WHERE reference_date = %s AND municipality_code = %s AND page_number = %s;
+                """, (stored, digest, size, reference_date, municipality_code, page_number))
+            conn.commit()
+            remember_refs(new_refs)
+        total += len(rows)
+        print(f"   {total} pages compacted...")
+
+def storage_report():
+    """
+    Bytes per reference month: as received (raw_bytes, or the JSON text size
+    for rows stored before hashing) vs. on disk after normalization and TOAST
+    compression. The shared reference table is reported separately.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT reference_date,
+                   COUNT(*),
+                   SUM(COALESCE(raw_bytes, octet_length(api_response::text))),
+                   SUM(pg_column_size(api_response))
+            FROM raw_bolsa_familia
+            GROUP BY reference_date
+            ORDER BY reference_date;
+        """)
+        months = cur.fetchall()
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(pg_column_size(body)), 0) FROM raw_ref_objeto;")
+        refs, ref_bytes = cur.fetchone()
+    return {
+        "months": [
+            {"reference_date": str(month), "pages": pages, "original_bytes": int(original),
+             "stored_bytes": int(stored), "saved_bytes": int(original - stored)}
+            for month, pages, original, stored in months
+        ],
+        "ref_objects": refs,
+        "ref_bytes": int(ref_bytes),
+    }
+
+def print_report(report):
+    print(f"{'Mês':<12}{'Páginas':>10}{'Original':>14}{'Armazenado':>14}{'Economia':>14}{'%':>7}")
+    total_original = total_stored = 0
+    for m in report["months"]:
+        pct = 100 * m["saved_bytes"] / m["original_bytes"] if m["original_bytes"] else 0
+        print(f"{m['reference_date'][:7]:<12}{m['pages']:>10}{m['original_bytes']:>14,}"
+              f"{m['stored_bytes']:>14,}{m['saved_bytes']:>14,}{pct:>6.1f}%")
+        total_original += m["original_bytes"]
+        total_stored += m["stored_bytes"]
+    total_stored += report["ref_bytes"]
+    saved = total_original - total_stored
+    pct = 100 * saved / total_original if total_original else 0
+    print(f"Referências compartilhadas: {report['ref_objects']} objetos, {report['ref_bytes']:,} bytes")
+    print(f"Total: {total_original:,} → {total_stored:,} bytes ({saved:,} economizados, {pct:.1f}%)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Raw storage report (bytes saved per month)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--compact-existing', action='store_true',
+                        help=f'Rewrite pages stored before hashing in RAW_STORAGE={RAW_STORAGE} mode first')
+    args = parser.parse_args()
+
+    if args.compact_existing:
+        init_db()
+        print(f"Compacted {compact_existing()} pages.")
+
+    report = storage_report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
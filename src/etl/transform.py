@@ -0,0 +1,169 @@
+import argparse
+import logging
+import time
+from src.db.connection import connection, init_db
+from src.etl.aggregates import refresh_months
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+WATERMARK_NAME = "raw_bolsa_familia->star_schema"
+# Raw rows are stamped with their transaction start time, so a long-running
+# insert can commit "behind" the watermark. Re-reading a small window is safe
+# because every statement below is an idempotent upsert.
+LOOKBACK = "10 minutes"
+
+# One row per item of every raw page in the current batch. Compact pages
+# carry "$municipio"/"$tipo" references into raw_ref_objeto (see
+# src/etl/raw_storage.py), which are expanded back into the original shape.
+STAGE_ITEMS = """
+    CREATE TEMP TABLE _transform_items ON COMMIT DROP AS
+    SELECT r.ingested_at,
+           e.item - '$municipio' - '$tipo'
+               || CASE WHEN m.body IS NULL THEN '{}'::jsonb ELSE jsonb_build_object('municipio', m.body) END
+               || CASE WHEN t.body IS NULL THEN '{}'::jsonb ELSE jsonb_build_object('tipo', t.body) END
+               AS item
+    FROM raw_bolsa_familia r
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE jsonb_typeof(r.api_response)
+            WHEN 'array' THEN r.api_response
+            ELSE jsonb_build_array(r.api_response)
+        END
+    ) AS e(item)
+    LEFT JOIN raw_ref_objeto m ON m.ref = e.item->>'$municipio'
+    LEFT JOIN raw_ref_objeto t ON t.ref = e.item->>'$tipo'
+    WHERE r.reference_date = %(reference_date)s
+      AND r.ingested_at > %(since)s
+      AND r.ingested_at <= %(until)s;
+"""
+
+UPSERT_MUNICIPIO = """
+    INSERT INTO dim_municipio (codigo_ibge, nome_ibge, uf_sigla, nome_regiao, pais)
+    SELECT DISTINCT ON (item->'municipio'->>'codigoIBGE')
+        item->'municipio'->>'codigoIBGE',
+        item->'municipio'->>'nomeIBGE',
+        item->'municipio'->'uf'->>'sigla',
+        item->'municipio'->>'nomeRegiao',
+        item->'municipio'->>'pais'
+    FROM _transform_items
+    WHERE item->'municipio'->>'codigoIBGE' IS NOT NULL
+    ORDER BY item->'municipio'->>'codigoIBGE', ingested_at DESC
+    ON CONFLICT (codigo_ibge) DO UPDATE SET
+        nome_ibge = EXCLUDED.nome_ibge,
+        uf_sigla = EXCLUDED.uf_sigla,
+        nome_regiao = EXCLUDED.nome_regiao;
+"""
+
+UPSERT_PROGRAMA = """
+    INSERT INTO dim_programa (id, descricao, descricao_detalhada)
+    SELECT DISTINCT ON ((item->'tipo'->>'id')::int)
+        (item->'tipo'->>'id')::int,
+        item->'tipo'->>'descricao',
+        item->'tipo'->>'descricaoDetalhada'
+    FROM _transform_items
+    WHERE item->'tipo'->>'id' IS NOT NULL
+    ORDER BY (item->'tipo'->>'id')::int, ingested_at DESC
+    ON CONFLICT (id) DO UPDATE SET
+        descricao = EXCLUDED.descricao,
+        descricao_detalhada = EXCLUDED.descricao_detalhada;
+"""
+
+UPSERT_FACT = """
+    INSERT INTO fact_pagamentos_municipio
+    (data_referencia, codigo_ibge, programa_id, valor_total, quantidade_beneficiados)
+    SELECT DISTINCT ON (1, 2, 3)
+        (item->>'dataReferencia')::date,
+        item->'municipio'->>'codigoIBGE',
+        (item->'tipo'->>'id')::int,
+        (item->>'valor')::numeric,
+        (item->>'quantidadeBeneficiados')::bigint
+    FROM _transform_items
+    WHERE item->>'dataReferencia' IS NOT NULL
+      AND item->'municipio'->>'codigoIBGE' IS NOT NULL
+      AND item->'tipo'->>'id' IS NOT NULL
+    ORDER BY 1, 2, 3, ingested_at DESC
+    ON CONFLICT (data_referencia, codigo_ibge, programa_id) DO UPDATE SET
+        valor_total = EXCLUDED.valor_total,
+        quantidade_beneficiados = EXCLUDED.quantidade_beneficiados;
+"""
+
+def get_watermark(cur):
+    cur.execute("SELECT last_ingested_at FROM etl_watermark WHERE name = %s;", (WATERMARK_NAME,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def set_watermark(cur, ingested_at):
+    cur.execute("""
+        INSERT INTO etl_watermark (name, last_ingested_at)
+        VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET
+            last_ingested_at = GREATEST(etl_watermark.last_ingested_at, EXCLUDED.last_ingested_at),
+            updated_at = NOW();
+    """, (WATERMARK_NAME, ingested_at))
+
+def transform(rebuild=False):
+    """
+    Re-derives dim/fact tables from raw_bolsa_familia with set-based SQL.
+    Incremental by default (raw rows ingested since the watermark); with
+    `rebuild` the fact table is truncated and every raw row is reprocessed.
+    Work is committed one reference month at a time. Returns the months touched.
+    """
+    started = time.perf_counter()
+    with connection() as conn:
+        cur = conn.cursor()
+
+        if rebuild:
+            logging.info("🧹 Rebuilding: truncating fact_pagamentos_municipio...")
+            cur.execute("TRUNCATE fact_pagamentos_municipio;")
+            cur.execute("DELETE FROM etl_watermark WHERE name = %s;", (WATERMARK_NAME,))
+            conn.commit()
+
+        watermark = get_watermark(cur)
+        if watermark is None:
+            cur.execute("SELECT '-infinity'::timestamp, NOW()::timestamp;")
+        else:
+            cur.execute("SELECT %s::timestamp - %s::interval, NOW()::timestamp;", (watermark, LOOKBACK))
+        since, until = cur.fetchone()
+
+        cur.execute("""
+            SELECT reference_date, MAX(ingested_at)
+            FROM raw_bolsa_familia
+            WHERE ingested_at > %s AND ingested_at <= %s
+            GROUP BY reference_date
+            ORDER BY reference_date;
+        """, (since, until))
+        months = cur.fetchall()
+        conn.commit()
+
+        if not months:
+            logging.info("✅ Star schema already up to date.")
+            return []
+
+        logging.info(f"🔄 Transforming {len(months)} month(s) ingested after {since}...")
+        total_facts = 0
+        for reference_date, _ in months:
+            params = {"reference_date": reference_date, "since": since, "until": until}
+            cur.execute(STAGE_ITEMS, params)
+            cur.execute(UPSERT_MUNICIPIO)
+            cur.execute(UPSERT_PROGRAMA)
+            cur.execute(UPSERT_FACT)
+            facts = cur.rowcount
+            conn.commit()
+            total_facts += facts
+            logging.info(f"   {reference_date:%Y-%m}: {facts} fact rows upserted.")
+
+        set_watermark(cur, max(ingested_at for _, ingested_at in months))
+        conn.commit()
+        cur.close()
+
+    logging.info(f"🏁 Transform finished: {total_facts} fact rows in {time.perf_counter() - started:.1f}s.")
+    touched = [reference_date for reference_date, _ in months]
+    refresh_months(touched)
+    return touched
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rebuild the star schema from raw_bolsa_familia')
+    parser.add_argument('--rebuild', action='store_true', help='Truncate the fact table and reprocess every raw row')
+    args = parser.parse_args()
+
+    init_db()
+    transform(rebuild=args.rebuild)
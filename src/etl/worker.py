@@ -0,0 +1,283 @@
+"""
+Distributed ETL worker: any number of processes/containers split a backfill
+by claiming jobs from the etl_job_state queue (see src/etl/job_state.py).
+
+    python -m src.etl.worker enqueue --from 201901 --to 202412 --all-municipalities
+    docker compose up -d --scale etl=4     # each container runs `--wait`
+    python -m src.etl.worker --status
+
+Workers register in etl_worker and get an API key slot from API_KEYS
+(comma-separated; falls back to API_KEY). Workers sharing a key split its
+quota evenly, so N containers never exceed what one key allows. A worker
+that dies keeps its jobs only until their lease expires; the next claimer
+resumes them from the checkpoint.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+
+from src.db.connection import connection, init_db, prepare_partitions
+from src.etl import extract_bolsa_familia as extract
+from src.etl.aggregates import refresh_months
+from src.etl.job_state import (
+    STATUS_FAILED, enqueue_jobs, claim_jobs, heartbeat_jobs, release_jobs, queue_status
+)
+from src.etl.pagination import NATIONAL
+from src.etl.planner import MODES, month_range, plan
+from src import metrics
+
+LEASE_SECONDS = int(os.getenv("ETL_LEASE_SECONDS", "300"))
+HEARTBEAT_SECONDS = int(os.getenv("ETL_HEARTBEAT_SECONDS", "30"))
+MAX_ATTEMPTS = int(os.getenv("ETL_MAX_ATTEMPTS", "5"))
+POLL_SECONDS = int(os.getenv("ETL_POLL_SECONDS", "15"))
+# A worker missing 3 heartbeats no longer counts against its key's quota
+WORKER_TIMEOUT = 3 * HEARTBEAT_SECONDS
+# Serializes key slot assignment between workers starting together
+REGISTRY_LOCK_KEY = 720_417_002
+
+def api_keys():
+    keys = [k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()]
+    return keys or [extract.API_KEY]
+
+def enqueue(months, codigos, mode="auto", retry_failed=False):
+    """
+    Queues the planned jobs (see src/etl/planner.py) and prepares the month
+    partitions. With `retry_failed`, failed jobs among them (including those
+    past ETL_MAX_ATTEMPTS) go back to pending with their attempts reset.
+    """
+    init_db()
+    prepare_partitions(months)
+    jobs = plan(months, codigos, mode=mode).jobs
+    added = enqueue_jobs(jobs, retry_failed=retry_failed)
+    retried = " or re-queued" if retry_failed else ""
+    logging.info(f"📥 Enqueued{retried} {added} job(s) ({len(jobs) - added} already known).")
+    return added
+
+class Worker:
+    """Claims jobs from the queue and runs them on a local fetch pool."""
+
+    def __init__(self, threads=extract.DEFAULT_WORKERS, keys=None, worker_id=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.keys = keys or api_keys()
+        self.threads = threads
+        self.slot = None
+        self.stop = threading.Event()
+        self.months = set()
+
+    # --- Registry ---
+
+    def register(self):
+        """Joins etl_worker on the least used API key slot."""
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (REGISTRY_LOCK_KEY,))
+            cur.execute("""
+                DELETE FROM etl_worker
+                WHERE heartbeat_at < NOW() - make_interval(secs => %s);
+            """, (WORKER_TIMEOUT,))
+            cur.execute("SELECT api_key_slot, COUNT(*) FROM etl_worker GROUP BY api_key_slot;")
+            load = dict(cur.fetchall())
+            self.slot = min(range(len(self.keys)), key=lambda s: (load.get(s, 0), s))
+            cur.execute("""
+                INSERT INTO etl_worker (worker_id, api_key_slot)
+                VALUES (%s, %s)
+                ON CONFLICT (worker_id) DO UPDATE SET
+                    api_key_slot = EXCLUDED.api_key_slot,
+                    heartbeat_at = NOW();
+            """, (self.worker_id, self.slot))
+            conn.commit()
+        extract.HEADERS["chave-api-dados"] = self.keys[self.slot]
+        logging.info(f"👷 Worker {self.worker_id} registered on API key slot {self.slot + 1}/{len(self.keys)}.")
+
+    def unregister(self):
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM etl_worker WHERE worker_id = %s;", (self.worker_id,))
+            conn.commit()
+
+    def heartbeat(self):
+        """Renews this worker's leases and rebalances its share of the key's quota."""
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE etl_worker SET heartbeat_at = NOW() WHERE worker_id = %s;", (self.worker_id,))
+            registered = cur.rowcount
+            cur.execute("""
+                SELECT COUNT(*) FROM etl_worker
+                WHERE api_key_slot = %s AND heartbeat_at >= NOW() - make_interval(secs => %s);
+            """, (self.slot, WORKER_TIMEOUT))
+            peers = cur.fetchone()[0]
+            conn.commit()
+        if not registered:
+            # Timed out (e.g. a long GC pause or DB outage); rejoin on a fresh slot
+            self.register()
+            return self.heartbeat()
+        heartbeat_jobs(self.worker_id)
+
+        share = 1.0 / max(peers, 1)
+        if share != extract.rate_limiter.share:
+            extract.rate_limiter.set_share(share)
+            logging.info(f"⚖️ {peers} worker(s) on key slot {self.slot + 1}: "
+                         f"now {extract.rate_limiter.rate * 60:.0f} req/min.")
+
+    def _heartbeat_loop(self):
+        while not self.stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logging.error(f"Heartbeat failed: {e}")
+
+    # --- Work loop ---
+
+    def run(self, keep_waiting=False):
+        """
+        Claims and runs jobs until the queue is empty (or, with
+        `keep_waiting`, until stopped). Unfinished jobs go back to the queue
+        on the way out.
+        """
+        init_db()
+        self.register()
+        self.heartbeat()
+        threading.Thread(target=self._heartbeat_loop, name="etl-heartbeat", daemon=True).start()
+
+        meter = extract.ThroughputMeter(total_jobs=0)
+        pipeline = extract.new_pipeline(fetchers=self.threads)
+        sessions = threading.local()
+
+        def work(endpoint, mes_ano, codigo_ibge):
+            if not hasattr(sessions, "session"):
+                sessions.session = extract.get_session()
+            return extract.extract_month(sessions.session, endpoint, mes_ano, codigo_ibge,
+                                         pipeline, meter, stop=self.stop)
+
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="etl-fetch") as pool:
+                try:
+                    self._claim_loop(pool, running, work, meter, keep_waiting)
+                finally:
+                    # Also on Ctrl+C: in-flight jobs stop at their next page
+                    self.stop.set()
+        finally:
+            pipeline.close()
+            released = release_jobs(self.worker_id)
+            if released:
+                logging.info(f"↩️ Released {released} unfinished job(s) back to the queue.")
+            self.unregister()
+
+        meter.report()
+        pipeline.report()
+        self.refresh_aggregates()
+        return meter
+
+    def _claim_loop(self, pool, running, work, meter, keep_waiting):
+        while not self.stop.is_set():
+            free = self.threads - len(running)
+            if free:
+                for job in claim_jobs(self.worker_id, free, LEASE_SECONDS, MAX_ATTEMPTS):
+                    running[pool.submit(work, *job)] = job
+                    self.months.add(job[1])
+                    meter.total_jobs += 1
+
+            if not running:
+                if not keep_waiting:
+                    break
+                self.refresh_aggregates()
+                self.stop.wait(POLL_SECONDS)
+                continue
+
+            done, _ = wait(running, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                endpoint, mes_ano, codigo = running.pop(future)
+                try:
+                    outcome = future.result()
+                    if outcome == extract.JOB_INTERRUPTED:
+                        # Released back to the queue on the way out, not done
+                        meter.total_jobs -= 1
+                    else:
+                        meter.record_job(ok=outcome != STATUS_FAILED)
+                except Exception as e:
+                    logging.error(f"Job {mes_ano}/{codigo} failed: {e}")
+                    meter.record_job(ok=False)
+
+    def refresh_aggregates(self):
+        if self.months:
+            refresh_months([datetime.strptime(m, "%Y%m").date() for m in self.months])
+            self.months.clear()
+
+def print_status():
+    init_db()
+    counts = queue_status()
+    total = sum(counts.values())
+    print(f"Jobs: {total}")
+    for status, count in sorted(counts.items()):
+        print(f"  {status:<10} {count}")
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT w.worker_id, w.api_key_slot, w.heartbeat_at, COUNT(j.endpoint)
+            FROM etl_worker w
+            LEFT JOIN etl_job_state j ON j.claimed_by = w.worker_id AND j.status = 'running'
+            GROUP BY w.worker_id, w.api_key_slot, w.heartbeat_at
+            ORDER BY w.worker_id;
+        """)
+        workers = cur.fetchall()
+    print(f"Workers: {len(workers)}")
+    for worker_id, slot, heartbeat_at, jobs in workers:
+        print(f"  {worker_id:<30} key {slot + 1}  {jobs} job(s)  last seen {heartbeat_at:%H:%M:%S}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Distributed ETL worker (shared job queue)')
+    parser.add_argument('action', nargs='?', choices=['work', 'enqueue'], default='work')
+    parser.add_argument('--year', type=int, help='enqueue: entire year (YYYY)')
+    parser.add_argument('--month', type=str, help='enqueue: specific month (YYYYMM)')
+    parser.add_argument('--from', dest='from_month', type=str, help='enqueue: first month of a range (YYYYMM)')
+    parser.add_argument('--to', dest='to_month', type=str, help='enqueue: last month of the range (YYYYMM, default: last month)')
+    parser.add_argument('--ibge', type=str, default="3550308", help='enqueue: IBGE code (default: SP)')
+    parser.add_argument('--all-municipalities', action='store_true', help='enqueue: every Brazilian municipality')
+    parser.add_argument('--ibge-file', type=str, help='enqueue: file with one IBGE code per line')
+    parser.add_argument('--national', action='store_true', help='enqueue: national listing, one job per month')
+    parser.add_argument('--mode', choices=MODES, default='auto', help='enqueue: per-municipality jobs, national listing, or the cheaper one per month')
+    parser.add_argument('--retry-failed', action='store_true', help='enqueue: reset failed jobs (attempts included) to pending')
+    parser.add_argument('--threads', type=int, default=extract.DEFAULT_WORKERS, help='work: concurrent jobs in this worker')
+    parser.add_argument('--wait', action='store_true', help='work: keep polling for new jobs instead of exiting when the queue is empty')
+    parser.add_argument('--status', action='store_true', help='Show queue and worker status and exit')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port (/metrics, /metrics.json)')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        raise SystemExit(0)
+
+    if args.action == 'enqueue':
+        if args.from_month:
+            last_month = (datetime.now().replace(day=1) - timedelta(days=1)).strftime("%Y%m")
+            months = month_range(args.from_month, args.to_month or last_month)
+        elif args.year:
+            months = [f"{args.year}{m:02d}" for m in range(1, 13)]
+        else:
+            months = [args.month or "202401"]
+        if args.national:
+            codigos = [NATIONAL]
+        elif args.all_municipalities:
+            codigos = extract.load_all_municipalities()
+        elif args.ibge_file:
+            codigos = extract.load_ibge_file(args.ibge_file)
+        else:
+            codigos = [args.ibge]
+        enqueue(months, codigos, mode=args.mode, retry_failed=args.retry_failed)
+        raise SystemExit(0)
+
+    metrics.start_exporter(port=args.metrics_port)
+    worker = Worker(threads=args.threads)
+    # docker stop sends SIGTERM: stop claiming, checkpoint and hand jobs back
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop.set())
+    try:
+        worker.run(keep_waiting=args.wait)
+    except KeyboardInterrupt:
+        worker.stop.set()
@@ -0,0 +1,279 @@
+"""
+In-process counters and latency histograms for the ETL and the MCP servers.
+
+Instrument with `inc`, `observe`, or the `timed` decorator / `timer`
+context manager. Export with `render_prometheus()` (served by
+`start_http_server`) or `write_json()`. `start_exporter()` wires both from
+METRICS_PORT / METRICS_FILE. `profiling(path)` wraps a run in cProfile,
+including worker threads.
+"""
+import atexit
+import cProfile
+import functools
+import inspect
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "portal_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_help = {}
+_started_at = time.time()
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def describe(name, text):
+    _help[name] = text
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(DEFAULT_BUCKETS) + 2)
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(DEFAULT_BUCKETS)] += 1
+        hist[-1] += seconds
+
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+def timed(name, **labels):
+    """Decorator recording call latency; errors are counted in `<name>_errors_total`."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    inc(f"{name}_errors_total", **labels)
+                    raise
+                finally:
+                    observe(name, time.perf_counter() - started, **labels)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    inc(f"{name}_errors_total", **labels)
+                    raise
+                finally:
+                    observe(name, time.perf_counter() - started, **labels)
+        return wrapper
+    return decorate
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+# --- Export ---
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def render_prometheus():
+    """Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        metric = PREFIX + name
+        if metric not in seen:
+            seen.add(metric)
+            if name in _help:
+                lines.append(f"# HELP {metric} {_help[name]}")
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels_text(labels)} {value}")
+    for (name, labels), hist in sorted(histograms.items()):
+        metric = PREFIX + name
+        if metric not in seen:
+            seen.add(metric)
+            if name in _help:
+                lines.append(f"# HELP {metric} {_help[name]}")
+            lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(DEFAULT_BUCKETS, hist):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_labels_text(labels, [('le', bound)])} {cumulative}")
+        cumulative += hist[len(DEFAULT_BUCKETS)]
+        lines.append(f"{metric}_bucket{_labels_text(labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{metric}_sum{_labels_text(labels)} {hist[-1]}")
+        lines.append(f"{metric}_count{_labels_text(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def _quantile(hist, q):
+    total = sum(hist[:-1])
+    if not total:
+        return None
+    target = q * total
+    cumulative = 0
+    for bound, count in zip(DEFAULT_BUCKETS + (float("inf"),), hist[:-1]):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return None
+
+def snapshot():
+    """
+    JSON-friendly view: counters with per-second rates over the process
+    uptime, and histograms with count/sum/mean and bucket-bound p50/p99.
+    """
+    uptime = time.time() - _started_at
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    def label(name, labels):
+        return name + _labels_text(labels)
+
+    return {
+        "uptime_s": round(uptime, 1),
+        "counters": {
+            label(n, l): {"value": v, "per_s": round(v / uptime, 3) if uptime else 0.0}
+            for (n, l), v in sorted(counters.items())
+        },
+        "histograms": {
+            label(n, l): {
+                "count": sum(h[:-1]),
+                "sum_s": round(h[-1], 4),
+                "mean_s": round(h[-1] / sum(h[:-1]), 4) if sum(h[:-1]) else None,
+                "p50_le_s": _quantile(h, 0.50),
+                "p99_le_s": _quantile(h, 0.99),
+            }
+            for (n, l), h in sorted(histograms.items())
+        },
+    }
+
+def write_json(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        elif self.path.split("?")[0] in ("/", "/metrics"):
+            body, content_type = render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serves /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_json_writer(path, interval=15.0):
+    """Rewrites `path` every `interval` seconds and once more at exit."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            write_json(path)
+    threading.Thread(target=loop, name="metrics-json", daemon=True).start()
+    atexit.register(write_json, path)
+
+def start_exporter(port=None, path=None):
+    """Starts the exporters requested here or via METRICS_PORT / METRICS_FILE."""
+    port = port or int(os.getenv("METRICS_PORT", "0") or 0)
+    path = path or os.getenv("METRICS_FILE")
+    if port:
+        start_http_server(port)
+    if path:
+        start_json_writer(path, float(os.getenv("METRICS_INTERVAL", "15")))
+
+# --- Profiling ---
+
+@contextmanager
+def profiling(path, top=25):
+    """
+    cProfile for the block, including threads started inside it, dumped to
+    `path` (open with snakeviz / `python -m pstats`). No-op when `path` is
+    empty. For sampling without overhead, run under `py-spy record --threads`;
+    worker threads are named by stage.
+    """
+    if not path:
+        yield
+        return
+    profiles = []
+    profiles_lock = threading.Lock()
+
+    def profile_thread(*_):
+        profile = cProfile.Profile()
+        with profiles_lock:
+            profiles.append(profile)
+        profile.enable()
+
+    main = cProfile.Profile()
+    threading.setprofile(profile_thread)
+    main.enable()
+    try:
+        yield
+    finally:
+        main.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(main)
+        with profiles_lock:
+            for profile in profiles:
+                stats.add(profile)
+        stats.dump_stats(path)
+        stats.sort_stats("cumulative").print_stats(top)
+        print(f"Profile written to {path}")
+
+for _name, _text in (
+    ("http_request_seconds", "Latency of Portal API requests"),
+    ("http_responses_total", "Portal API responses by status"),
+    ("http_throttled_total", "429 responses from the Portal API"),
+    ("rate_limit_wait_seconds_total", "Time spent waiting on the rate limiter"),
+    ("retry_sleep_seconds_total", "Time spent sleeping between retries"),
+    ("db_commit_seconds", "Commit latency"),
+    ("stage_seconds", "Duration of ETL steps"),
+    ("rows_loaded_total", "Items loaded into the star schema"),
+    ("raw_pages_total", "Raw pages by outcome"),
+    ("cache_requests_total", "Cache lookups by result"),
+    ("mcp_tool_seconds", "MCP tool latency"),
+):
+    describe(_name, _text)
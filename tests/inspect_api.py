@@ -1,8 +1,13 @@
 import requests
 import json
 import os
+import sys
 import logging
-from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.endpoints import get_endpoint_by_date
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -12,22 +17,6 @@ HEADERS = {
     "chave-api-dados": os.getenv("API_KEY")
 }
 
-def get_endpoint_by_date(mes_ano_str):
-    """
-    Retorna o endpoint correto baseado na data de referência:
-    - Até 10/2021: Bolsa Família
-    - 11/2021 a 02/2023: Auxílio Brasil
-    - 03/2023 em diante: Novo Bolsa Família
-    """
-    data = datetime.strptime(mes_ano_str, "%Y%m")
-    
-    if data < datetime(2021, 11, 1):
-        return "/bolsa-familia-por-municipio"
-    elif data < datetime(2023, 3, 1):
-        return "/auxilio-brasil-por-municipio"
-    else:
-        return "/novo-bolsa-familia-por-municipio"
-
 def main():
     if not HEADERS["chave-api-dados"]:
         logging.error("ERRO: API_KEY não encontrada no arquivo .env!")
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.batch import (
+    ALL_PAGES, CAPITAIS, NATIONAL, date_windows, parse_codes, parse_month, parse_months, parse_pages, table
+)
+
+class TestBatchSpecs(unittest.TestCase):
+
+    def test_months_ranges_and_years(self):
+        self.assertEqual(parse_months("202311-202402, 202311"), ["202311", "202312", "202401", "202402"])
+        self.assertEqual(len(parse_months("2023")), 12)
+        with self.assertRaises(ValueError):
+            parse_months("")
+
+    def test_single_month(self):
+        self.assertEqual(parse_month(" 202401"), "202401")
+        for bad in ("2024-01", "202413", "20241", "jan/24"):
+            with self.assertRaises(ValueError):
+                parse_month(bad)
+
+    def test_codes(self):
+        self.assertEqual(len(CAPITAIS), 27)
+        self.assertEqual(parse_codes("capitais,3550308")[-1], CAPITAIS[-1])
+        self.assertEqual(parse_codes("todos"), [NATIONAL])
+        with self.assertRaises(ValueError):
+            parse_codes("São Paulo")
+
+    def test_pages(self):
+        self.assertEqual(parse_pages("1-3,5"), [1, 2, 3, 5])
+        self.assertIs(parse_pages("todas"), ALL_PAGES)
+
+    def test_date_windows_cover_range(self):
+        windows = date_windows("01/01/2024", "15/03/2024")
+        self.assertEqual(windows[0], ("01/01/2024", "30/01/2024"))
+        self.assertEqual(windows[-1][1], "15/03/2024")
+        self.assertEqual(len(windows), 3)
+
+    def test_table_merges_and_dedupes(self):
+        columns, rows = table([{"id": 1, "orgao": {"nome": "A"}}, {"id": 2, "valor": 3}, {"id": 1}])
+        self.assertEqual(columns, ["id", "orgao.nome", "valor"])
+        self.assertEqual(rows, [[1, "A", None], [2, None, 3]])
+
+if __name__ == '__main__':
+    unittest.main()
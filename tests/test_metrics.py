@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_prometheus_histogram_is_cumulative(self):
+        metrics.observe("http_request_seconds", 0.02, client="etl")
+        metrics.observe("http_request_seconds", 3.0, client="etl")
+        text = metrics.render_prometheus()
+        self.assertIn('portal_http_request_seconds_bucket{client="etl",le="0.025"} 1', text)
+        self.assertIn('portal_http_request_seconds_bucket{client="etl",le="+Inf"} 2', text)
+        self.assertIn('portal_http_request_seconds_count{client="etl"} 2', text)
+
+    def test_counters_and_labels(self):
+        metrics.inc("http_responses_total", client="etl", status=200)
+        metrics.inc("http_responses_total", client="etl", status=200)
+        metrics.inc("http_responses_total", client="etl", status=429)
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters['http_responses_total{client="etl",status="200"}']["value"], 2)
+        self.assertEqual(counters['http_responses_total{client="etl",status="429"}']["value"], 1)
+
+    def test_timed_keeps_coroutines_async(self):
+        @metrics.timed("mcp_tool_seconds", tool="eco")
+        async def eco(valor: str):
+            return valor
+
+        self.assertTrue(asyncio.iscoroutinefunction(eco))
+        self.assertEqual(asyncio.run(eco("ok")), "ok")
+        self.assertEqual(metrics.snapshot()["histograms"]['mcp_tool_seconds{tool="eco"}']["count"], 1)
+
+    def test_timed_counts_errors(self):
+        @metrics.timed("stage_seconds", stage="falha")
+        def falha():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            falha()
+        self.assertIn('stage_seconds_errors_total{stage="falha"}', metrics.snapshot()["counters"])
+
+if __name__ == '__main__':
+    unittest.main()
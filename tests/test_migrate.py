@@ -0,0 +1,32 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db.migrate import available_migrations, MIGRATIONS_DIR
+
+class TestMigrations(unittest.TestCase):
+
+    def test_ordered_by_numeric_prefix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("0010_later.sql", "0002_first.py", "README.md", "0003_second.sql"):
+                open(os.path.join(directory, name), "w").close()
+            versions = [(v, n) for v, n, _ in available_migrations(directory)]
+        self.assertEqual(versions, [(2, "first"), (3, "second"), (10, "later")])
+
+    def test_duplicate_versions_rejected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("0001_a.sql", "0001_b.sql"):
+                open(os.path.join(directory, name), "w").close()
+            with self.assertRaises(RuntimeError):
+                available_migrations(directory)
+
+    def test_shipped_migrations_are_contiguous(self):
+        versions = [v for v, _, _ in available_migrations(MIGRATIONS_DIR)]
+        self.assertEqual(versions, list(range(1, len(versions) + 1)))
+
+if __name__ == '__main__':
+    unittest.main()
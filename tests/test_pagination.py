@@ -0,0 +1,24 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.etl.pagination import is_last_page
+
+class TestPagination(unittest.TestCase):
+
+    def test_short_page_is_last(self):
+        self.assertTrue(is_last_page([{}] * 3, 15))
+        self.assertFalse(is_last_page([{}] * 15, 15))
+
+    def test_unknown_size_reads_until_empty(self):
+        """Without a page size a short page may still be followed by more data"""
+        self.assertFalse(is_last_page([{}] * 3, None))
+
+    def test_single_object_response(self):
+        self.assertTrue(is_last_page({"id": 1}, 15))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.etl import pipeline as pipeline_module
+from src.etl.job_state import STATUS_COMPLETED, STATUS_FAILED
+from src.etl.pipeline import PagePipeline
+
+JOB = ("/x", "202401", "BR")
+
+class TestPagePipeline(unittest.TestCase):
+
+    def run_job(self, save_raw, load_relational, pages=4):
+        calls = {"mark": [], "rewind": []}
+        with mock.patch.object(pipeline_module, "mark_job", lambda *a: calls["mark"].append(a[-1])), \
+             mock.patch.object(pipeline_module, "rewind_job", lambda *a: calls["rewind"].append(a[-1])), \
+             mock.patch.object(pipeline_module, "dead_letter"), \
+             mock.patch.object(pipeline_module, "resolve_dead_letters"):
+            pipeline = PagePipeline(save_raw, load_relational).start()
+            for page in range(1, pages + 1):
+                pipeline.submit_page(JOB, page, [page])
+            pipeline.finish_job(JOB)
+            pipeline.close()
+        return calls
+
+    def test_completed_after_every_page_loads(self):
+        loaded = []
+        calls = self.run_job(lambda *a, **k: None, loaded.append)
+        self.assertEqual(loaded, [[1], [2], [3], [4]])
+        self.assertEqual(calls, {"mark": [STATUS_COMPLETED], "rewind": []})
+
+    def test_raw_failure_rewinds_and_drops_later_pages(self):
+        saved = []
+        def save_raw(data, mes_ano, codigo_ibge, page, endpoint=None):
+            if page == 2:
+                raise RuntimeError("disk full")
+            saved.append(page)
+        calls = self.run_job(save_raw, lambda data: None)
+        self.assertEqual(saved, [1])
+        self.assertEqual(calls, {"mark": [STATUS_FAILED], "rewind": [2]})
+
+    def test_transform_failure_fails_the_job(self):
+        def load_relational(data):
+            if data == [3]:
+                raise RuntimeError("bad item")
+        calls = self.run_job(lambda *a, **k: None, load_relational)
+        self.assertEqual(calls, {"mark": [STATUS_FAILED], "rewind": [3]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from unittest import mock
+from src.api.endpoints import get_endpoint_by_date
+from src.api.rate_limit import BRASILIA, QuotaProfile
+from src.etl.planner import month_range, estimate_seconds, expected_pages
+
+class TestPlanner(unittest.TestCase):
+
+    def test_month_range_crosses_years(self):
+        self.assertEqual(month_range("202111", "202202"), ["202111", "202112", "202201", "202202"])
+        with self.assertRaises(ValueError):
+            month_range("202401", "202312")
+
+    def test_program_eras(self):
+        self.assertEqual(get_endpoint_by_date("202110"), "/bolsa-familia-por-municipio")
+        self.assertEqual(get_endpoint_by_date("202111"), "/auxilio-brasil-por-municipio")
+        self.assertEqual(get_endpoint_by_date("202302"), "/auxilio-brasil-por-municipio")
+        self.assertEqual(get_endpoint_by_date("202303"), "/novo-bolsa-familia-por-municipio")
+
+    def test_estimate_follows_night_quota(self):
+        profile = QuotaProfile(60, 600)
+        # 23:00 → one daytime hour (3600 requests), then the rest at the night rate
+        start = datetime(2024, 1, 1, 23, tzinfo=BRASILIA)
+        self.assertAlmostEqual(estimate_seconds(3600 + 6000, profile, start=start), 3600 + 600)
+        self.assertEqual(estimate_seconds(600, profile, fixed_rate=2.0), 300)
+
+    def test_expected_pages_with_unknown_page_size(self):
+        """Unknown size: national listing sized by the documented 15/page, plus the empty-page probe"""
+        with mock.patch("src.etl.planner.get_page_size", return_value=None):
+            self.assertEqual(expected_pages("/x", True, {}), 372 + 1)
+            self.assertEqual(expected_pages("/x", False, {}), 1 + 1)
+        with mock.patch("src.etl.planner.get_page_size", return_value=10):
+            self.assertEqual(expected_pages("/x", True, {}), 557)
+            self.assertEqual(expected_pages("/x", False, {("/x", False): 2.5}), 2.5)
+
+if __name__ == '__main__':
+    unittest.main()
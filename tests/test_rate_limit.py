@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from src.api.rate_limit import AdaptiveLimiter, QuotaProfile, parse_retry_after, BRASILIA
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveLimiter(QuotaProfile(60), capacity=1, clock=self.clock)
+
+    def test_429_halves_rate_and_honors_retry_after(self):
+        self.assertEqual(self.limiter.reserve(), 0)
+        pause = self.limiter.observe(429, {"Retry-After": "5"})
+        self.assertEqual(pause, 5)
+        self.assertAlmostEqual(self.limiter.rate, 0.5)
+        # Next caller waits for the pause plus one token at the reduced rate
+        self.assertAlmostEqual(self.limiter.reserve(), 5 + 2)
+
+    def test_burst_of_429s_counts_once(self):
+        self.limiter.observe(429, {"Retry-After": "2"})
+        self.limiter.observe(429, {"Retry-After": "2"})
+        self.assertAlmostEqual(self.limiter.fraction, 0.5)
+
+    def test_successes_recover_additively(self):
+        self.limiter.observe(429, {})
+        for _ in range(10):
+            self.limiter.observe(200)
+        self.assertAlmostEqual(self.limiter.fraction, 0.7)
+
+    def test_share_splits_quota(self):
+        self.limiter.set_share(0.25)
+        self.assertAlmostEqual(self.limiter.rate, 0.25)
+        with self.assertRaises(ValueError):
+            self.limiter.set_share(0)
+
+    def test_night_profile(self):
+        profile = QuotaProfile(90, 300)
+        self.assertEqual(profile.rate_at(datetime(2024, 1, 1, 3, tzinfo=BRASILIA)) * 60, 300)
+        self.assertEqual(profile.rate_at(datetime(2024, 1, 1, 14, tzinfo=BRASILIA)) * 60, 90)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertEqual(parse_retry_after("Mon, 01 Jan 2024 00:00:10 GMT",
+                                           now=datetime.fromisoformat("2024-01-01T00:00:00+00:00")), 10)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
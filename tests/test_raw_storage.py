@@ -0,0 +1,26 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.etl.raw_storage import compact, expand
+
+class TestRawStorage(unittest.TestCase):
+
+    def test_expand_restores_compacted_page(self):
+        page = [
+            {"id": 1, "valor": 10.5, "municipio": {"codigoIBGE": "3550308"}, "tipo": {"id": 1}},
+            {"id": 2, "valor": 7.0, "municipio": {"codigoIBGE": "3550308"}, "tipo": {"id": 2}},
+        ]
+        stored, refs = compact(page)
+        self.assertEqual(len(refs), 3)
+        bodies = {key: body for key, (_, body) in refs.items()}
+        self.assertEqual(expand(stored, bodies), page)
+
+    def test_single_object_untouched(self):
+        self.assertEqual(expand({"id": 1}, {}), {"id": 1})
+
+if __name__ == '__main__':
+    unittest.main()
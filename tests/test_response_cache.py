@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import tempfile
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.cache import ResponseCache, cache_key, ttl_for, TTL_CURRENT, TTL_DEFAULT
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_canonical_key(self):
+        """Param order and value types do not change the key"""
+        a = cache_key("/x", {"mesAno": "202401", "codigoIbge": "3550308", "pagina": 1})
+        b = cache_key("/x", {"pagina": "1", "codigoIbge": "3550308", "mesAno": 202401})
+        self.assertEqual(a, b)
+
+    def test_lru_evicts_by_bytes(self):
+        cache = ResponseCache(max_bytes=40)
+        cache.set("a", ["x" * 10])
+        cache.set("b", ["y" * 10])
+        cache.get("a")  # 'a' becomes most recently used
+        cache.set("c", ["z" * 10])
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_value_larger_than_bound_is_not_stored(self):
+        cache = ResponseCache(max_bytes=40)
+        cache.set("a", ["x" * 10])
+        cache.set("big", ["y" * 100])
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get("a"), ["x" * 10])
+        stats = cache.stats()
+        self.assertEqual(stats["too_large"], 1)
+        self.assertEqual(stats["evictions"], 0)
+        self.assertLessEqual(stats["bytes"], 40)
+
+    def test_oversized_value_keeps_disk_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            cache = ResponseCache(max_bytes=40, path=path)
+            cache.set("a", ["x" * 10])
+            cache.set("a2", ["x" * 10])
+            cache.set("a2", ["y" * 100])  # replaces a2 with a value too big to keep
+            stats = cache.stats()
+            self.assertEqual(stats["disk_entries"], 1)
+            self.assertEqual(stats["too_large"], 1)
+            warm = ResponseCache(path=path)
+            self.assertEqual(warm.get("a"), ["x" * 10])
+            self.assertIsNone(warm.get("a2"))
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = ResponseCache(clock=clock)
+        cache.set("k", {"v": 1}, ttl=10)
+        clock.now += 5
+        self.assertEqual(cache.get("k"), {"v": 1})
+        clock.now += 10
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disk_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            ResponseCache(path=path).set("k", [{"valor": 1.5}])
+            warm = ResponseCache(path=path)
+            self.assertEqual(warm.get("k"), [{"valor": 1.5}])
+            self.assertEqual(warm.stats()["disk_hits"], 1)
+
+    def test_disk_backend_is_bounded(self):
+        """Past max_disk_bytes, expired rows go first, then the oldest"""
+        clock = FakeClock()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            cache = ResponseCache(max_bytes=1000, path=path, clock=clock, max_disk_bytes=40)
+            cache.set("expired", ["w" * 10], ttl=5)
+            clock.now += 1
+            cache.set("old", ["x" * 10])
+            clock.now += 10
+            cache.set("mid", ["y" * 10])
+            clock.now += 1
+            cache.set("new", ["z" * 10])
+            stats = cache.stats()
+            self.assertEqual(stats["disk_entries"], 2)
+            self.assertLessEqual(stats["disk_bytes"], 40)
+            self.assertEqual(stats["disk_evictions"], 1)
+
+            warm = ResponseCache(path=path, clock=clock)
+            self.assertIsNone(warm.get("old"))
+            self.assertEqual(warm.get("new"), ["z" * 10])
+
+    def test_ttl_policy(self):
+        today = date(2024, 5, 15)
+        self.assertIsNone(ttl_for("/bf", {"mesAno": "202401"}, today))
+        self.assertEqual(ttl_for("/bf", {"mesAno": "202404"}, today), TTL_CURRENT)
+        self.assertEqual(ttl_for("/bf", {"mesAno": "202405"}, today), TTL_CURRENT)
+        self.assertEqual(ttl_for("/licitacoes", {"dataFinal": "31/01/2024"}, today), TTL_DEFAULT)
+        self.assertEqual(ttl_for("/licitacoes", {"dataFinal": "10/05/2024"}, today), TTL_CURRENT)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)